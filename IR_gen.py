@@ -1,5 +1,9 @@
+import hashlib
 import io
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 
 import pandas as pd
@@ -26,6 +30,9 @@ CITY_CODES = {
 
 STANDARD_IMAGE_WIDTH_IN = 5.5
 
+SEQUENCE_COLUMNS = ["Date", "Time", "Category", "Message"]
+ACTIONS_COLUMNS = ["Date", "Time", "Performed by", "Action", "Result"]
+
 SHAREPOINT_SITE_URL = st.secrets.get("sharepoint", {}).get("site_url", "")
 INCIDENT_REPORTS_ROOT_PATH = st.secrets.get("sharepoint", {}).get(
     "incident_reports_root_path",
@@ -79,7 +86,9 @@ def _append_figures_after_heading(doc, heading_text, files, captions, figure_sta
                 img_p = _insert_paragraph_after(anchor)
                 img_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
                 run = img_p.add_run()
-                run.add_picture(io.BytesIO(f.getvalue()), width=Inches(STANDARD_IMAGE_WIDTH_IN))
+                # UploadedFile is already a BytesIO; rewind and let python-docx read it once
+                f.seek(0)
+                run.add_picture(f, width=Inches(STANDARD_IMAGE_WIDTH_IN))
 
                 caption_text = ""
                 if captions and idx < len(captions):
@@ -155,6 +164,28 @@ def generate_docx(data):
     return out.read()
 
 
+@st.cache_resource
+def _docx_executor() -> ThreadPoolExecutor:
+    # one pool per server process; survives reruns
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="ir-docx")
+
+
+def generate_docx_with_progress(data):
+    """
+    Build the DOCX on a worker thread and show elapsed time while it runs.
+    generate_docx() must not touch st.* since it runs off the script thread.
+    """
+    t0 = time.monotonic()
+    with st.status("Generating DOCX...", expanded=False) as status:
+        fut = _docx_executor().submit(generate_docx, data)
+        while not fut.done():
+            status.update(label=f"Generating DOCX... {int(time.monotonic() - t0)}s")
+            time.sleep(0.2)
+        docx_bytes = fut.result()
+        status.update(label="DOCX generated.", state="complete")
+    return docx_bytes
+
+
 # ==============================
 # PARSE EXISTING DOCX
 # ==============================
@@ -174,6 +205,10 @@ def _get_paragraph_after_heading(doc, heading_text):
     return ""
 
 
+def _blank_df(columns):
+    return pd.DataFrame([dict.fromkeys(columns, "")])
+
+
 def _table_to_sequence_df(table):
     rows = []
     for r in table.rows:
@@ -182,7 +217,7 @@ def _table_to_sequence_df(table):
             rows.append({"Date": cells[0], "Time": cells[1], "Category": cells[2], "Message": cells[3]})
     df = pd.DataFrame(rows)
     if df.empty:
-        df = pd.DataFrame([{"Date": "", "Time": "", "Category": "", "Message": ""}])
+        df = _blank_df(SEQUENCE_COLUMNS)
     return df
 
 
@@ -196,7 +231,7 @@ def _table_to_actions_df(table):
             rows.append({"Date": cells[0], "Time": cells[1], "Performed by": cells[2], "Action": cells[3], "Result": cells[4]})
     df = pd.DataFrame(rows)
     if df.empty:
-        df = pd.DataFrame([{"Date": "", "Time": "", "Performed by": "", "Action": "", "Result": ""}])
+        df = _blank_df(ACTIONS_COLUMNS)
     return df
 
 
@@ -242,6 +277,23 @@ def normalize_serial(serial_raw: str) -> str:
     return s.zfill(4)
 
 
+@st.cache_data(ttl=120, show_spinner=False)
+def _last_existing_serial(_token, drive_id, root_path, year, city, site_code):
+    return spg.last_ir_serial(_token, drive_id, root_path, year, city, site_code)
+
+
+def _fill_suggested_serial(token, drive_id, year, city, site_code):
+    # serials uploaded in this session count too, so repeat clicks stay local
+    try:
+        last = _last_existing_serial(token, drive_id, INCIDENT_REPORTS_ROOT_PATH, year, city, site_code)
+    except Exception as e:
+        st.session_state["serial_suggest_error"] = str(e)
+        return
+    used = st.session_state.get("ir_serials_used", {}).get(f"{year}/{city}", [])
+    st.session_state["serial_raw"] = f"{max([last, *used]) + 1:04d}"
+    st.session_state.pop("serial_suggest_error", None)
+
+
 def _must_have_token():
     ms_graph.login_ui(scopes=SCOPES)
     token = ms_graph.get_access_token()
@@ -251,11 +303,12 @@ def _must_have_token():
 
 
 def _ensure_defaults():
+    today = date.today().strftime("%Y-%m-%d")
     defaults = {
         "reported_by": "",
         "position": "",
-        "date_of_report": date.today().strftime("%Y-%m-%d"),
-        "incident_date": date.today().strftime("%Y-%m-%d"),
+        "date_of_report": today,
+        "incident_date": today,
         "incident_time": datetime.now().strftime("%H:%M:%S"),
         "location": "",
         "current_status": "Resolved",
@@ -263,8 +316,6 @@ def _ensure_defaults():
         "damages": "None",
         "investigation": "",
         "conclusion": "",
-        "seq_df": pd.DataFrame([{"Date": "", "Time": "", "Category": "", "Message": ""}]),
-        "actions_df": pd.DataFrame([{"Date": "", "Time": "", "Performed by": "", "Action": "", "Result": ""}]),
         "serial_raw": "",
         "loaded_update_target": None,
         "loaded_full_incident_no": "",
@@ -272,6 +323,29 @@ def _ensure_defaults():
     for k, v in defaults.items():
         st.session_state.setdefault(k, v)
 
+    # DataFrames are only built the first time; the editors keep their own state after that
+    if "seq_df" not in st.session_state:
+        st.session_state["seq_df"] = _blank_df(SEQUENCE_COLUMNS)
+    if "actions_df" not in st.session_state:
+        st.session_state["actions_df"] = _blank_df(ACTIONS_COLUMNS)
+
+
+def _upload_fingerprint(f) -> tuple:
+    # UploadedFile.file_id changes on every new upload, even with the same name
+    return (getattr(f, "file_id", ""), f.name, getattr(f, "size", 0))
+
+
+def _docx_cache_key(data: dict) -> str:
+    parts = []
+    for k in sorted(data):
+        v = data[k]
+        if isinstance(v, pd.DataFrame):
+            v = v.to_csv(index=False)
+        elif k.endswith("_images"):
+            v = [_upload_fingerprint(f) for f in v]
+        parts.append((k, v))
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
 
 def _df_valid(df: object) -> bool:
     return isinstance(df, pd.DataFrame) and (not df.empty) and (len(df.columns) > 0)
@@ -280,199 +354,227 @@ def _df_valid(df: object) -> bool:
 # ==============================
 # APP START
 # ==============================
-st.set_page_config(page_title="Incident Report Generator", layout="wide")
-st.title("Incident Report Generator")
-
-token = _must_have_token()
-
-if not SHAREPOINT_SITE_URL:
-    st.error("Missing sharepoint.site_url in Streamlit secrets.")
-    st.stop()
-
-if "sp_site_id" not in st.session_state or "sp_drive_id" not in st.session_state:
-    with st.spinner("Resolving SharePoint site/drive..."):
-        st.session_state["sp_site_id"] = spg.resolve_site_id(token, SHAREPOINT_SITE_URL)
-        st.session_state["sp_drive_id"] = spg.get_default_drive_id(token, st.session_state["sp_site_id"])
+def main():
+    st.set_page_config(page_title="Incident Report Generator", layout="wide")
+    st.title("Incident Report Generator")
 
-drive_id = st.session_state["sp_drive_id"]
-this_year = str(datetime.now().year)
+    token = _must_have_token()
 
-_ensure_defaults()
+    if not SHAREPOINT_SITE_URL:
+        st.error("Missing sharepoint.site_url in Streamlit secrets.")
+        st.stop()
 
-mode = st.radio("Mode", ["Create New", "Update Existing"], horizontal=True)
+    if "sp_site_id" not in st.session_state or "sp_drive_id" not in st.session_state:
+        with st.spinner("Resolving SharePoint site/drive..."):
+            st.session_state["sp_site_id"] = spg.resolve_site_id(token, SHAREPOINT_SITE_URL)
+            st.session_state["sp_drive_id"] = spg.get_default_drive_id(token, st.session_state["sp_site_id"])
 
-# ==============================
-# UPDATE EXISTING SELECTOR
-# ==============================
-if mode == "Update Existing":
-    st.subheader("Select existing Incident Report to update")
+    drive_id = st.session_state["sp_drive_id"]
+    this_year = str(datetime.now().year)
 
-    u_year = st.selectbox("Year", [this_year, str(int(this_year) - 1)], index=0, key="u_year")
-    u_city = st.selectbox("Ground Station Location", list(CITY_CODES.keys()), key="u_city")
+    # Once per session, list the year/city folders in the background so the
+    # first duplicate check doesn't wait on Graph
+    if not st.session_state.get("sp_prewarmed"):
+        st.session_state["sp_prewarmed"] = True
+        threading.Thread(
+            target=spg.prewarm_city_folders,
+            args=(token, drive_id, INCIDENT_REPORTS_ROOT_PATH, [this_year, str(int(this_year) - 1)], list(CITY_CODES)),
+            daemon=True,
+        ).start()
 
-    base_path = f"{INCIDENT_REPORTS_ROOT_PATH}/{u_year}/{u_city}"
+    _ensure_defaults()
 
-    if st.button("Refresh folders/files", key="u_refresh"):
-        for k in ["u_folders", "u_files", "u_files_folder"]:
-            st.session_state.pop(k, None)
+    mode = st.radio("Mode", ["Create New", "Update Existing"], horizontal=True)
 
-    if "u_folders" not in st.session_state:
-        try:
-            st.session_state["u_folders"] = spg.list_incident_folders(token, drive_id, base_path)
-        except Exception as e:
-            st.error(f"Cannot list incident folders: {e}")
-            st.session_state["u_folders"] = []
+    # ==============================
+    # UPDATE EXISTING SELECTOR
+    # ==============================
+    if mode == "Update Existing":
+        st.subheader("Select existing Incident Report to update")
 
-    folders = st.session_state.get("u_folders", [])
-    folder_names = [f["name"] for f in folders]
+        u_year = st.selectbox("Year", [this_year, str(int(this_year) - 1)], index=0, key="u_year")
+        u_city = st.selectbox("Ground Station Location", list(CITY_CODES.keys()), key="u_city")
 
-    u_folder_name = st.selectbox("Incident Folder (Incident No.)", ["-- select --"] + folder_names, key="u_folder")
+        base_path = f"{INCIDENT_REPORTS_ROOT_PATH}/{u_year}/{u_city}"
 
-    if u_folder_name != "-- select --":
-        folder_meta = next((x for x in folders if x["name"] == u_folder_name), None)
-        folder_id = folder_meta["id"]
+        if st.button("Refresh folders/files", key="u_refresh"):
+            for k in ["u_folders", "u_files", "u_files_folder"]:
+                st.session_state.pop(k, None)
 
-        if "u_files" not in st.session_state or st.session_state.get("u_files_folder") != folder_id:
+        if "u_folders" not in st.session_state:
             try:
-                st.session_state["u_files"] = spg.list_files(token, drive_id, folder_id)
-                st.session_state["u_files_folder"] = folder_id
+                st.session_state["u_folders"] = spg.list_incident_folders(token, drive_id, base_path)
             except Exception as e:
-                st.error(f"Cannot list files: {e}")
-                st.session_state["u_files"] = []
+                st.error(f"Cannot list incident folders: {e}")
+                st.session_state["u_folders"] = []
 
-        files = st.session_state.get("u_files", [])
-        docx_files = [f for f in files if f["name"].lower().endswith(".docx")]
-        docx_names = [f["name"] for f in docx_files]
+        folders = st.session_state.get("u_folders", [])
+        folder_names = [f["name"] for f in folders]
 
-        u_docx = st.selectbox("DOCX file", ["-- select --"] + docx_names, key="u_docx")
+        u_folder_name = st.selectbox("Incident Folder (Incident No.)", ["-- select --"] + folder_names, key="u_folder")
 
-        if u_docx != "-- select --":
-            fmeta = next((x for x in docx_files if x["name"] == u_docx), None)
+        if u_folder_name != "-- select --":
+            folder_meta = next((x for x in folders if x["name"] == u_folder_name), None)
+            folder_id = folder_meta["id"]
 
-            if st.button("Load into form", key="u_load"):
+            if "u_files" not in st.session_state or st.session_state.get("u_files_folder") != folder_id:
                 try:
-                    b = spg.download_file_bytes(token, drive_id, fmeta["id"])
-                    parsed = parse_existing_ir_docx(b)
-
-                    st.session_state["reported_by"] = parsed.get("reported_by", "")
-                    st.session_state["position"] = parsed.get("position", "")
-                    st.session_state["date_of_report"] = parsed.get("date_of_report", date.today().strftime("%Y-%m-%d"))
-
-                    st.session_state["incident_date"] = parsed.get("incident_date", date.today().strftime("%Y-%m-%d"))
-                    st.session_state["incident_time"] = parsed.get("incident_time", datetime.now().strftime("%H:%M:%S"))
-                    st.session_state["location"] = parsed.get("location", u_city)
-                    st.session_state["current_status"] = parsed.get("current_status", "Resolved") or "Resolved"
-
-                    st.session_state["nature"] = parsed.get("nature", "")
-                    st.session_state["damages"] = parsed.get("damages", "None") or "None"
-                    st.session_state["investigation"] = parsed.get("investigation", "")
-                    st.session_state["conclusion"] = parsed.get("conclusion", "")
-
-                    seq_df = parsed.get("sequence_df")
-                    act_df = parsed.get("actions_df")
-                    if _df_valid(seq_df):
-                        st.session_state["seq_df"] = seq_df
-                    if _df_valid(act_df):
-                        st.session_state["actions_df"] = act_df
-
-                    st.session_state["loaded_update_target"] = {
-                        "year": u_year,
-                        "city": u_city,
-                        "folder_name": u_folder_name,
-                        "folder_id": folder_id,
-                        "docx_name": u_docx,
-                        "docx_id": fmeta["id"],
-                    }
-                    st.session_state["loaded_full_incident_no"] = parsed.get("full_incident_no", u_folder_name)
-
-                    st.success("Loaded. Scroll down, edit details, then click Generate Report.")
+                    st.session_state["u_files"] = spg.list_files(token, drive_id, folder_id)
+                    st.session_state["u_files_folder"] = folder_id
                 except Exception as e:
-                    st.error(f"Load failed: {e}")
-
-st.divider()
+                    st.error(f"Cannot list files: {e}")
+                    st.session_state["u_files"] = []
+
+            files = st.session_state.get("u_files", [])
+            docx_files = [f for f in files if f["name"].lower().endswith(".docx")]
+            docx_names = [f["name"] for f in docx_files]
+
+            u_docx = st.selectbox("DOCX file", ["-- select --"] + docx_names, key="u_docx")
+
+            if u_docx != "-- select --":
+                fmeta = next((x for x in docx_files if x["name"] == u_docx), None)
+
+                if st.button("Load into form", key="u_load"):
+                    try:
+                        b = spg.download_file_bytes(token, drive_id, fmeta["id"])
+                        parsed = parse_existing_ir_docx(b)
+
+                        st.session_state["reported_by"] = parsed.get("reported_by", "")
+                        st.session_state["position"] = parsed.get("position", "")
+                        st.session_state["date_of_report"] = parsed.get("date_of_report", date.today().strftime("%Y-%m-%d"))
+
+                        st.session_state["incident_date"] = parsed.get("incident_date", date.today().strftime("%Y-%m-%d"))
+                        st.session_state["incident_time"] = parsed.get("incident_time", datetime.now().strftime("%H:%M:%S"))
+                        st.session_state["location"] = parsed.get("location", u_city)
+                        st.session_state["current_status"] = parsed.get("current_status", "Resolved") or "Resolved"
+
+                        st.session_state["nature"] = parsed.get("nature", "")
+                        st.session_state["damages"] = parsed.get("damages", "None") or "None"
+                        st.session_state["investigation"] = parsed.get("investigation", "")
+                        st.session_state["conclusion"] = parsed.get("conclusion", "")
+
+                        seq_df = parsed.get("sequence_df")
+                        act_df = parsed.get("actions_df")
+                        if _df_valid(seq_df):
+                            st.session_state["seq_df"] = seq_df
+                        if _df_valid(act_df):
+                            st.session_state["actions_df"] = act_df
+
+                        st.session_state["loaded_update_target"] = {
+                            "year": u_year,
+                            "city": u_city,
+                            "folder_name": u_folder_name,
+                            "folder_id": folder_id,
+                            "docx_name": u_docx,
+                            "docx_id": fmeta["id"],
+                        }
+                        st.session_state["loaded_full_incident_no"] = parsed.get("full_incident_no", u_folder_name)
+
+                        st.success("Loaded. Scroll down, edit details, then click Generate Report.")
+                    except Exception as e:
+                        st.error(f"Load failed: {e}")
+
+    st.divider()
+
+    # ==============================
+    # MAIN FORM
+    # ==============================
+    loaded = st.session_state.get("loaded_update_target")
 
-# ==============================
-# MAIN FORM
-# ==============================
-loaded = st.session_state.get("loaded_update_target")
-
-if mode == "Create New":
-    year = st.selectbox("Year folder", [this_year, str(int(this_year) - 1)], index=0, key="main_year")
-    city = st.selectbox("Ground Station Location", list(CITY_CODES.keys()), key="main_city")
-    site_code = CITY_CODES[city]
-
-    serial_raw = st.text_input("Incident serial (000#)", value=st.session_state.get("serial_raw", ""), key="serial_raw")
-    serial = normalize_serial(serial_raw)
+    if mode == "Create New":
+        year = st.selectbox("Year folder", [this_year, str(int(this_year) - 1)], index=0, key="main_year")
+        city = st.selectbox("Ground Station Location", list(CITY_CODES.keys()), key="main_city")
+        site_code = CITY_CODES[city]
+
+        s1, s2, s3 = st.columns([4, 1, 1])
+        with s1:
+            serial_raw = st.text_input("Incident serial (000#)", value=st.session_state.get("serial_raw", ""), key="serial_raw")
+        with s2:
+            st.button(
+                "Suggest next serial",
+                key="serial_suggest",
+                on_click=_fill_suggested_serial,
+                args=(token, drive_id, year, city, site_code),
+            )
+        with s3:
+            if st.button("Refresh serials", key="serial_refresh"):
+                _last_existing_serial.clear()
+        if st.session_state.get("serial_suggest_error"):
+            st.error(f"Cannot list existing serials: {st.session_state['serial_suggest_error']}")
+        serial = normalize_serial(serial_raw)
+
+        full_incident_no = f"SMCOD-IR-GS-{site_code}-{year}-{serial}" if serial else ""
+        st.text_input("Full Incident No. (auto)", value=full_incident_no, disabled=True)
+        # early hint from a recent listing; the upload itself re-checks live
+        if full_incident_no:
+            try:
+                seen = spg.ir_folder_seen(token, drive_id, INCIDENT_REPORTS_ROOT_PATH, year, city, full_incident_no)
+            except Exception:
+                seen = False
+            if seen:
+                st.warning("This Incident No folder already exists. Use a new serial.")
+
+    else:
+        if not loaded:
+            st.warning("Load an existing DOCX above first.")
+            st.stop()
 
-    full_incident_no = f"SMCOD-IR-GS-{site_code}-{year}-{serial}" if serial else ""
-    st.text_input("Full Incident No. (auto)", value=full_incident_no, disabled=True)
+        full_incident_no = st.session_state.get("loaded_full_incident_no") or loaded.get("folder_name", "")
+        st.text_input("Incident No.", value=full_incident_no, disabled=True)
+
+    with st.form("ir_form"):
+        c1, c2 = st.columns(2)
+        with c1:
+            reported_by = st.text_input("Reported by", key="reported_by")
+            position = st.text_input("Position", key="position")
+            date_of_report = st.text_input("Date of Report (YYYY-MM-DD)", key="date_of_report")
+        with c2:
+            incident_date = st.text_input("Incident Date (YYYY-MM-DD)", key="incident_date")
+            incident_time = st.text_input("Incident Time", key="incident_time")
+            location = st.text_input("Location", key="location")
+            current_status = st.selectbox(
+                "Current Status",
+                ["Resolved", "Ongoing", "Monitoring", "Open"],
+                index=["Resolved", "Ongoing", "Monitoring", "Open"].index(st.session_state.get("current_status", "Resolved")),
+                key="current_status",
+            )
 
-else:
-    if not loaded:
-        st.warning("Load an existing DOCX above first.")
-        st.stop()
+        nature = st.text_area("Nature of Incident", height=120, key="nature")
 
-    full_incident_no = st.session_state.get("loaded_full_incident_no") or loaded.get("folder_name", "")
-    st.text_input("Incident No.", value=full_incident_no, disabled=True)
-
-with st.form("ir_form"):
-    c1, c2 = st.columns(2)
-    with c1:
-        reported_by = st.text_input("Reported by", key="reported_by")
-        position = st.text_input("Position", key="position")
-        date_of_report = st.text_input("Date of Report (YYYY-MM-DD)", key="date_of_report")
-    with c2:
-        incident_date = st.text_input("Incident Date (YYYY-MM-DD)", key="incident_date")
-        incident_time = st.text_input("Incident Time", key="incident_time")
-        location = st.text_input("Location", key="location")
-        current_status = st.selectbox(
-            "Current Status",
-            ["Resolved", "Ongoing", "Monitoring", "Open"],
-            index=["Resolved", "Ongoing", "Monitoring", "Open"].index(st.session_state.get("current_status", "Resolved")),
-            key="current_status",
+        st.subheader("Sequence of Events")
+        seq_df = st.data_editor(
+            st.session_state.get("seq_df"),
+            num_rows="dynamic",
+            use_container_width=True,
+            key="seq_editor",
+        )
+        seq_imgs = st.file_uploader("Sequence Photos (optional)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
+        seq_caps = captions_editor(seq_imgs or [], "seq_caps")
+
+        damages = st.text_area("Damages Incurred", key="damages")
+        dmg_imgs = st.file_uploader("Damage Photos (optional)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
+        dmg_caps = captions_editor(dmg_imgs or [], "dmg_caps")
+
+        investigation = st.text_area("Investigation and Analysis", height=120, key="investigation")
+        inv_imgs = st.file_uploader("Investigation Photos (optional)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
+        inv_caps = captions_editor(inv_imgs or [], "inv_caps")
+
+        conclusion = st.text_area("Conclusion and Recommendations", height=120, key="conclusion")
+        con_imgs = st.file_uploader("Conclusion Photos (optional)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
+        con_caps = captions_editor(con_imgs or [], "con_caps")
+
+        st.subheader("Response and Actions Taken")
+        actions_df = st.data_editor(
+            st.session_state.get("actions_df"),
+            num_rows="dynamic",
+            use_container_width=True,
+            key="actions_editor",
         )
 
-    nature = st.text_area("Nature of Incident", height=120, key="nature")
-
-    st.subheader("Sequence of Events")
-    seq_df = st.data_editor(
-        st.session_state.get("seq_df"),
-        num_rows="dynamic",
-        use_container_width=True,
-        key="seq_editor",
-    )
-    seq_imgs = st.file_uploader("Sequence Photos (optional)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
-    seq_caps = captions_editor(seq_imgs or [], "seq_caps")
-
-    damages = st.text_area("Damages Incurred", key="damages")
-    dmg_imgs = st.file_uploader("Damage Photos (optional)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
-    dmg_caps = captions_editor(dmg_imgs or [], "dmg_caps")
-
-    investigation = st.text_area("Investigation and Analysis", height=120, key="investigation")
-    inv_imgs = st.file_uploader("Investigation Photos (optional)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
-    inv_caps = captions_editor(inv_imgs or [], "inv_caps")
-
-    conclusion = st.text_area("Conclusion and Recommendations", height=120, key="conclusion")
-    con_imgs = st.file_uploader("Conclusion Photos (optional)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
-    con_caps = captions_editor(con_imgs or [], "con_caps")
-
-    st.subheader("Response and Actions Taken")
-    actions_df = st.data_editor(
-        st.session_state.get("actions_df"),
-        num_rows="dynamic",
-        use_container_width=True,
-        key="actions_editor",
-    )
-
-    submit = st.form_submit_button("Generate Report")
-
-if submit:
-    if mode == "Create New":
-        serial = normalize_serial(st.session_state.get("serial_raw", ""))
-        if not serial:
-            st.error("Enter a valid incident serial (numbers only up to 4 digits). Example: 0001 or 1.")
-            st.stop()
+        submit = st.form_submit_button("Generate Report")
 
+    # Built on every rerun so the download below can tell whether the stored
+    # file still matches the form, mode and incident number on screen
     data = {
         "reported_by": reported_by,
         "position": position,
@@ -498,51 +600,84 @@ if submit:
         "conclusion_captions": con_caps or [],
     }
 
-    docx_bytes = generate_docx(data)
+    docx_key = _docx_cache_key({**data, "mode": mode})
 
-    try:
-        with st.spinner("Uploading DOCX to SharePoint..."):
-            if mode == "Update Existing":
-                target_folder_id = loaded["folder_id"]
-                filename = loaded.get("docx_name") or f"{full_incident_no}.docx"
-            else:
-                is_dup = spg.check_duplicate_ir(
-                    token,
-                    drive_id,
-                    INCIDENT_REPORTS_ROOT_PATH,
-                    st.session_state["main_year"],
-                    st.session_state["main_city"],
-                    full_incident_no,
-                )
-                if is_dup:
-                    st.error("Duplicate found: this Incident No folder already exists. Use a new serial.")
-                    st.stop()
+    if submit:
+        if mode == "Create New":
+            serial = normalize_serial(st.session_state.get("serial_raw", ""))
+            if not serial:
+                st.error("Enter a valid incident serial (numbers only up to 4 digits). Example: 0001 or 1.")
+                st.stop()
+
+        if st.session_state.get("docx_key") != docx_key:
+            st.session_state["docx_bytes"] = generate_docx_with_progress(data)
+            st.session_state["docx_key"] = docx_key
+        st.session_state["docx_file_name"] = f"{full_incident_no}.docx"
+        docx_bytes = st.session_state["docx_bytes"]
 
-                incident_folder = spg.ensure_path(
+        try:
+            with st.spinner("Uploading DOCX to SharePoint..."):
+                if mode == "Update Existing":
+                    target_folder_id = loaded["folder_id"]
+                    filename = loaded.get("docx_name") or f"{full_incident_no}.docx"
+                else:
+                    is_dup = spg.check_duplicate_ir(
+                        token,
+                        drive_id,
+                        INCIDENT_REPORTS_ROOT_PATH,
+                        st.session_state["main_year"],
+                        st.session_state["main_city"],
+                        full_incident_no,
+                    )
+                    if is_dup:
+                        st.error("Duplicate found: this Incident No folder already exists. Use a new serial.")
+                        st.stop()
+
+                    # exist_ok=False also catches a folder made since the check above
+                    try:
+                        incident_folder = spg.ensure_path(
+                            token,
+                            drive_id,
+                            INCIDENT_REPORTS_ROOT_PATH,
+                            parts=[st.session_state["main_year"], st.session_state["main_city"], full_incident_no],
+                            exist_ok=False,
+                        )
+                    except FileExistsError:
+                        st.error("Duplicate found: this Incident No folder already exists. Use a new serial.")
+                        st.stop()
+                    target_folder_id = incident_folder["id"]
+                    filename = f"{full_incident_no}.docx"
+
+                spg.upload_file_to_folder(
                     token,
                     drive_id,
-                    INCIDENT_REPORTS_ROOT_PATH,
-                    parts=[st.session_state["main_year"], st.session_state["main_city"], full_incident_no],
+                    folder_item_id=target_folder_id,
+                    filename=filename,
+                    content=docx_bytes,
+                    content_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                 )
-                target_folder_id = incident_folder["id"]
-                filename = f"{full_incident_no}.docx"
-
-            spg.upload_file_to_folder(
-                token,
-                drive_id,
-                folder_item_id=target_folder_id,
-                filename=filename,
-                content_bytes=docx_bytes,
-                content_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            )
 
-        st.success("Report generated and uploaded.")
-    except Exception as e:
-        st.error(f"Upload failed: {e}")
-
-    st.download_button(
-        "Download Incident Report (DOCX)",
-        data=docx_bytes,
-        file_name=f"{full_incident_no}.docx",
-        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    )
+            if mode == "Create New":
+                used_key = f"{st.session_state['main_year']}/{st.session_state['main_city']}"
+                st.session_state.setdefault("ir_serials_used", {}).setdefault(used_key, []).append(int(serial))
+
+            st.success("Report generated and uploaded.")
+        except Exception as e:
+            st.error(f"Upload failed: {e}")
+
+    # Served from session state so later reruns (e.g. the download click) don't
+    # rebuild it; dropped once the inputs no longer match the generated file
+    if st.session_state.get("docx_key") != docx_key:
+        for k in ("docx_bytes", "docx_key", "docx_file_name"):
+            st.session_state.pop(k, None)
+    if st.session_state.get("docx_bytes"):
+        st.download_button(
+            "Download Incident Report (DOCX)",
+            data=st.session_state["docx_bytes"],
+            file_name=st.session_state.get("docx_file_name") or "Incident Report.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,10 @@
+import re
+import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import gspread
-from google.oauth2.service_account import Credentials
-import re
 from datetime import datetime
-import os
 
-# ========== CONFIG ==========
-SERVICE_ACCOUNT_FILE = "C:\\Users\\user-307E6E3400\\Desktop\\Python Scripts\\GS App\\keys\\endless-theorem-421101-fe0721f63c55.json"
-SPREADSHEET_ID = "1iR49Cx05EWtbG__o_-gl0SXvHgg5qNBhJ04q7HZN5dQ"
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
-# ============================
+from sheets_client import SheetsClient, column_b_text, write_text_file
 
 
 def parse_command_line(line):
@@ -95,6 +89,7 @@ def convert_log(file_contents):
     console_output += f"\nSC file converted with {len(warnings)} warning(s).\n"
     return "\n".join(output_lines), console_output
 
+
 # ---------- MAIN GUI APP ----------
 
 class SheetColumnFetcherApp:
@@ -102,8 +97,13 @@ class SheetColumnFetcherApp:
         self.root = root
         self.root.title("Google Sheets Column B Fetcher + SC Converter")
 
-        self.client = None
-        self.spreadsheet = None
+        # Build the layout hidden so Tk does a single geometry pass at the end
+        root.withdraw()
+
+        # Sheets API client; its network I/O runs on a background asyncio loop
+        self.sheets = SheetsClient()
+        self._colB_cache = {}  # sheet title -> column B values
+        self._last_output = ""  # text last put in text_box by a fetch
 
         self.sheet_var = tk.StringVar()
 
@@ -115,7 +115,11 @@ class SheetColumnFetcherApp:
 
         # --- Fetch button ---
         ttk.Button(root, text="Fetch Column B", command=self.fetch_column_b).grid(
-            row=1, column=0, columnspan=3, padx=5, pady=5, sticky="we"
+            row=1, column=0, columnspan=2, padx=5, pady=5, sticky="we"
+        )
+        self.skip_blanks_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(root, text="Skip blank cells", variable=self.skip_blanks_var).grid(
+            row=1, column=2, padx=5, pady=5, sticky="w"
         )
 
         # --- Text box for fetched content ---
@@ -143,31 +147,70 @@ class SheetColumnFetcherApp:
         root.grid_rowconfigure(2, weight=1)
         root.grid_columnconfigure(1, weight=1)
 
-        # Initialize Sheets
-        try:
-            self.init_gspread()
-            self.load_sheets()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to initialize Google Sheets client:\n{e}")
+        root.update_idletasks()
+        root.deiconify()
+        root.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        # Initialize Sheets (in the background)
+        self.sheets.submit(self._init_and_load())
+
+    # -------- Tk helpers --------
+
+    def _on_tk(self, fn, *args):
+        """Schedule fn on the Tk main thread."""
+        self.root.after(0, fn, *args)
+
+    def _on_close(self):
+        self.sheets.close()
+        self.root.destroy()
 
     # -------- Google Sheets handling --------
 
-    def init_gspread(self):
-        creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        self.client = gspread.authorize(creds)
-        self.spreadsheet = self.client.open_by_key(SPREADSHEET_ID)
+    async def _init_and_load(self):
+        try:
+            await self.sheets.init()
+        except Exception as e:
+            self._on_tk(messagebox.showerror, "Error", f"Failed to initialize Google Sheets client:\n{e}")
+            return
+        await self._load_sheets_async()
 
     def load_sheets(self):
-        if not self.spreadsheet:
+        if not self.sheets.ready:
             return
+        self.sheets.submit(self._load_sheets_async())
+
+    async def _load_sheets_async(self):
         try:
-            sheets = self.spreadsheet.worksheets()
-            names = [s.title for s in sheets]
-            self.sheet_dropdown["values"] = names
-            if names:
-                self.sheet_dropdown.current(0)
+            names = await self.sheets.fetch_sheet_titles()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to load sheets:\n{e}")
+            self._on_tk(messagebox.showerror, "Error", f"Failed to load sheets:\n{e}")
+            return
+
+        # Show the names right away; column B keeps loading behind them
+        self._on_tk(self._on_sheet_names, names)
+
+        # Column B of every sheet in the background
+        cache, errors = await self.sheets.prefetch_column_b(names)
+        self._on_tk(self._on_prefetch_done, cache)
+        if errors:
+            self._on_tk(messagebox.showerror, "Error", f"Failed to prefetch Column B:\n{errors[0]}")
+
+    def _on_sheet_names(self, names):
+        self._colB_cache = {}
+        self.sheet_dropdown["values"] = names
+        if names:
+            self.sheet_dropdown.current(0)
+
+    def _on_prefetch_done(self, cache):
+        self._colB_cache.update(cache)
+
+    async def _fetch_column_b_async(self, sheet_name):
+        try:
+            col_b = await self.sheets.column_b(sheet_name)
+        except Exception as e:
+            self._on_tk(messagebox.showerror, "Error", f"Failed to fetch Column B:\n{e}")
+            return
+        self._on_tk(self._on_column_b, sheet_name, col_b)
 
     def fetch_column_b(self):
         sheet_name = self.sheet_var.get()
@@ -175,19 +218,29 @@ class SheetColumnFetcherApp:
             messagebox.showwarning("Select Sheet", "Please select a sheet first.")
             return
 
-        try:
-            worksheet = self.spreadsheet.worksheet(sheet_name)
-            col_b = worksheet.col_values(2)  # Column B
+        col_b = self._colB_cache.get(sheet_name)
+        if col_b is None:
+            self.sheets.submit(self._fetch_column_b_async(sheet_name))
+            return
+        self._show_column_b(col_b)
 
-            self.text_box.delete("1.0", tk.END)
-            output_text = "\n".join(col_b)
-            self.text_box.insert(tk.END, output_text)
+    def _on_column_b(self, sheet_name, col_b):
+        self._colB_cache[sheet_name] = col_b
+        self._show_column_b(col_b)
+
+    def _show_column_b(self, col_b):
+        try:
+            # One cell per line; trailing blanks trimmed without touching the cache
+            output_text = column_b_text(col_b, self.skip_blanks_var.get())
+            self._last_output = output_text
+            # Swap the whole buffer in one Tk call instead of delete + insert
+            self.text_box.replace("1.0", tk.END, output_text)
+            self.text_box.edit_modified(False)
 
             # Auto-save to fetched_column_b.txt in script folder
             script_dir = os.path.dirname(os.path.abspath(__file__))
             auto_path = os.path.join(script_dir, "fetched_column_b.txt")
-            with open(auto_path, "w", encoding="utf-8") as f:
-                f.write(output_text)
+            write_text_file(auto_path, output_text)
 
             messagebox.showinfo(
                 "Success",
@@ -197,8 +250,14 @@ class SheetColumnFetcherApp:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to fetch Column B:\n{e}")
 
+    def _current_text(self):
+        """Text box content; skips reading Tk's buffer while it still holds the last fetch."""
+        if self.text_box.edit_modified():
+            return self.text_box.get("1.0", tk.END).rstrip("\n")
+        return self._last_output
+
     def save_to_txt(self):
-        content = self.text_box.get("1.0", tk.END).rstrip("\n")
+        content = self._current_text()
         if not content.strip():
             messagebox.showwarning("No Content", "There is no content to save.")
             return
@@ -210,8 +269,7 @@ class SheetColumnFetcherApp:
         )
         if file_path:
             try:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(content)
+                write_text_file(file_path, content)
                 messagebox.showinfo("Saved", f"File saved:\n{file_path}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save file:\n{e}")
@@ -219,7 +277,7 @@ class SheetColumnFetcherApp:
     # -------- SC conversion via GUI --------
 
     def convert_sc_commands(self):
-        raw_text = self.text_box.get("1.0", tk.END).rstrip("\n")
+        raw_text = self._current_text()
         if not raw_text.strip():
             messagebox.showwarning("No Content", "No text to convert. Fetch Column B or paste SC log first.")
             return
@@ -262,8 +320,7 @@ class SheetColumnFetcherApp:
             )
             if path:
                 try:
-                    with open(path, "w", encoding="utf-8") as f:
-                        f.write(converted_text)
+                    write_text_file(path, converted_text)
                     messagebox.showinfo("Saved", f"Converted file saved:\n{path}")
                 except Exception as e_inner:
                     messagebox.showerror("Error", f"Failed to save converted file:\n{e_inner}")
@@ -1,24 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import gspread
-from google.oauth2.service_account import Credentials
 
-# ===================== CONFIGURATION =====================
+from sheets_client import SheetsClient, column_b_text, write_text_file
 
-SERVICE_ACCOUNT_FILE = "C:\\Users\\user-307E6E3400\\Desktop\\Python Scripts\\GS App\\keys\\endless-theorem-421101-fe0721f63c55.json"
-SPREADSHEET_ID = "1iR49Cx05EWtbG__o_-gl0SXvHgg5qNBhJ04q7HZN5dQ"
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
-
-# =========================================================
 
 class SheetColumnFetcherApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Google Sheets Column B Fetcher")
 
-        # Initialize client & spreadsheet (set in self.init_gspread)
-        self.client = None
-        self.spreadsheet = None
+        # Build the layout hidden so Tk does a single geometry pass at the end
+        root.withdraw()
+
+        # Sheets API client; its network I/O runs on a background asyncio loop
+        self.sheets = SheetsClient()
+        self._colB_cache = {}  # sheet title -> column B values
+        self._last_output = ""  # text last put in text_box by a fetch
 
         # GUI widgets
         self.sheet_label = ttk.Label(root, text="Select Sheet:")
@@ -32,7 +29,11 @@ class SheetColumnFetcherApp:
         self.reload_button.grid(row=0, column=2, padx=5, pady=5)
 
         self.fetch_button = ttk.Button(root, text="Fetch Column B", command=self.fetch_column_b)
-        self.fetch_button.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="we")
+        self.fetch_button.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky="we")
+
+        self.skip_blanks_var = tk.BooleanVar(value=False)
+        self.skip_blanks_check = ttk.Checkbutton(root, text="Skip blank cells", variable=self.skip_blanks_var)
+        self.skip_blanks_check.grid(row=1, column=2, padx=5, pady=5, sticky="w")
 
         self.text_box = tk.Text(root, wrap="none", width=80, height=20)
         self.text_box.grid(row=2, column=0, columnspan=3, padx=5, pady=5, sticky="nsew")
@@ -52,37 +53,76 @@ class SheetColumnFetcherApp:
         root.grid_rowconfigure(2, weight=1)
         root.grid_columnconfigure(1, weight=1)
 
-        # Initialize gspread and load sheets
+        root.update_idletasks()
+        root.deiconify()
+        root.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        # Initialize the Sheets client and load sheets (in the background)
+        self.sheets.submit(self._init_and_load())
+
+    # -------- Tk helpers --------
+
+    def _on_tk(self, fn, *args):
+        """Schedule fn on the Tk main thread."""
+        self.root.after(0, fn, *args)
+
+    def _on_close(self):
+        self.sheets.close()
+        self.root.destroy()
+
+    # -------- Google Sheets handling --------
+
+    async def _init_and_load(self):
         try:
-            self.init_gspread()
-            self.load_sheets()
+            await self.sheets.init()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to initialize Google Sheets client:\n{e}")
-
-    def init_gspread(self):
-        """Initialize gspread client using service account credentials."""
-        creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        self.client = gspread.authorize(creds)
-        self.spreadsheet = self.client.open_by_key(SPREADSHEET_ID)
+            self._on_tk(messagebox.showerror, "Error", f"Failed to initialize Google Sheets client:\n{e}")
+            return
+        await self._load_sheets_async()
 
     def load_sheets(self):
         """Load worksheet names into the dropdown."""
-        if self.spreadsheet is None:
+        if not self.sheets.ready:
             messagebox.showerror("Error", "Spreadsheet is not initialized.")
             return
+        self.sheets.submit(self._load_sheets_async())
 
+    async def _load_sheets_async(self):
         try:
-            worksheets = self.spreadsheet.worksheets()
-            sheet_names = [ws.title for ws in worksheets]
-            self.sheet_dropdown["values"] = sheet_names
-
-            if sheet_names:
-                # Select first sheet by default
-                self.sheet_dropdown.current(0)
-            else:
-                messagebox.showwarning("No Sheets", "This spreadsheet has no worksheets.")
+            sheet_names = await self.sheets.fetch_sheet_titles()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to load sheets:\n{e}")
+            self._on_tk(messagebox.showerror, "Error", f"Failed to load sheets:\n{e}")
+            return
+
+        # Show the names right away; column B keeps loading behind them
+        self._on_tk(self._on_sheet_names, sheet_names)
+
+        # Column B of every sheet in the background
+        cache, errors = await self.sheets.prefetch_column_b(sheet_names)
+        self._on_tk(self._on_prefetch_done, cache)
+        if errors:
+            self._on_tk(messagebox.showerror, "Error", f"Failed to prefetch Column B:\n{errors[0]}")
+
+    def _on_sheet_names(self, sheet_names):
+        self._colB_cache = {}
+        self.sheet_dropdown["values"] = sheet_names
+
+        if sheet_names:
+            # Select first sheet by default
+            self.sheet_dropdown.current(0)
+        else:
+            messagebox.showwarning("No Sheets", "This spreadsheet has no worksheets.")
+
+    def _on_prefetch_done(self, cache):
+        self._colB_cache.update(cache)
+
+    async def _fetch_column_b_async(self, sheet_name):
+        try:
+            column_b_values = await self.sheets.column_b(sheet_name)
+        except Exception as e:
+            self._on_tk(messagebox.showerror, "Error", f"Failed to fetch Column B:\n{e}")
+            return
+        self._on_tk(self._on_column_b, sheet_name, column_b_values)
 
     def fetch_column_b(self):
         """Fetch column B from the selected worksheet and display it in the text box."""
@@ -91,24 +131,34 @@ class SheetColumnFetcherApp:
             messagebox.showwarning("Select Sheet", "Please select a sheet first.")
             return
 
-        try:
-            worksheet = self.spreadsheet.worksheet(sheet_name)
-            # Column B is index 2
-            column_b_values = worksheet.col_values(2)
+        column_b_values = self._colB_cache.get(sheet_name)
+        if column_b_values is None:
+            self.sheets.submit(self._fetch_column_b_async(sheet_name))
+            return
+        self._show_column_b(column_b_values)
 
-            # Clear the text box
-            self.text_box.delete("1.0", tk.END)
+    def _on_column_b(self, sheet_name, column_b_values):
+        self._colB_cache[sheet_name] = column_b_values
+        self._show_column_b(column_b_values)
 
-            # Join each cell in a new line
-            output_text = "\n".join(column_b_values)
-            self.text_box.insert(tk.END, output_text)
+    def _show_column_b(self, column_b_values):
+        # One cell per line; trailing blanks trimmed without touching the cache
+        output_text = column_b_text(column_b_values, self.skip_blanks_var.get())
+        self._last_output = output_text
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to fetch Column B:\n{e}")
+        # Swap the whole buffer in one Tk call instead of delete + insert
+        self.text_box.replace("1.0", tk.END, output_text)
+        self.text_box.edit_modified(False)
+
+    def _current_text(self):
+        """Text box content; skips reading Tk's buffer while it still holds the last fetch."""
+        if self.text_box.edit_modified():
+            return self.text_box.get("1.0", tk.END).rstrip("\n")
+        return self._last_output
 
     def save_to_txt(self):
         """Save the content of the text box to a .txt file."""
-        content = self.text_box.get("1.0", tk.END).rstrip("\n")
+        content = self._current_text()
         if not content.strip():
             messagebox.showwarning("No Content", "There is no content to save.")
             return
@@ -121,8 +171,7 @@ class SheetColumnFetcherApp:
 
         if file_path:
             try:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(content)
+                write_text_file(file_path, content)
                 messagebox.showinfo("Saved", f"File saved successfully:\n{file_path}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save file:\n{e}")
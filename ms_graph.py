@@ -1,5 +1,11 @@
+import atexit
 import os
+import threading
 import time
+import uuid
+from functools import lru_cache
+from types import MappingProxyType
+
 import streamlit as st
 import msal
 
@@ -7,9 +13,16 @@ DEFAULT_SCOPES_READONLY = ["User.Read", "Sites.Read.All"]
 DEFAULT_SCOPES_WRITE = ["User.Read", "Sites.ReadWrite.All"]
 
 _STATE_QP_KEY = "ms_state"
+_FLOW_TTL_S = 600  # auth code flows older than this are dropped from the store
+_REFRESH_RETRY_S = 60  # wait before retrying a failed early (refresh_on) refresh
+
+# MSAL token cache (owner-only file) so refresh tokens survive a server restart
+_TOKEN_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "gs-app", "msal.cache")
+_TOKEN_CACHE_LOCK = threading.Lock()
 
 
-def _cfg() -> dict:
+@lru_cache(maxsize=1)
+def _cfg() -> MappingProxyType:
     s = st.secrets.get("ms_graph", {})
     tenant_id = s.get("tenant_id") or os.getenv("MS_TENANT_ID", "")
     client_id = s.get("client_id") or os.getenv("MS_CLIENT_ID", "")
@@ -20,16 +33,22 @@ def _cfg() -> dict:
     if not authority and tenant_id:
         authority = f"https://login.microsoftonline.com/{tenant_id}"
 
-    return {
+    # read-only: the same mapping is handed to every caller
+    return MappingProxyType({
         "tenant_id": tenant_id,
         "client_id": client_id,
         "client_secret": client_secret,
         "redirect_uri": redirect_uri,
         "authority": authority or "",
-    }
+    })
+
 
+def reload_config() -> None:
+    """Drop the cached config so edited secrets/env vars are picked up."""
+    _cfg.cache_clear()
 
-def _require_cfg() -> dict:
+
+def _require_cfg() -> MappingProxyType:
     cfg = _cfg()
     missing = [k for k in ["tenant_id", "client_id", "client_secret", "redirect_uri", "authority"] if not cfg.get(k)]
     if missing:
@@ -38,30 +57,87 @@ def _require_cfg() -> dict:
     return cfg
 
 
-def _msal_app() -> msal.ConfidentialClientApplication:
-    cfg = _require_cfg()
+def _save_token_cache(cache: msal.SerializableTokenCache) -> None:
+    # Sessions and the atexit hook all save here: serialize one at a time and
+    # swap a finished temp file into place so a reader never sees a torn cache
+    with _TOKEN_CACHE_LOCK:
+        if not cache.has_state_changed:
+            return
+        tmp_path = f"{_TOKEN_CACHE_PATH}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(_TOKEN_CACHE_PATH), exist_ok=True)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(cache.serialize())
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, _TOKEN_CACHE_PATH)
+            cache.has_state_changed = False
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+@st.cache_resource
+def _token_cache() -> msal.SerializableTokenCache:
+    cache = msal.SerializableTokenCache()
+    try:
+        with open(_TOKEN_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache.deserialize(f.read())
+    except (OSError, ValueError):
+        pass
+    atexit.register(_save_token_cache, cache)
+    return cache
+
+
+@st.cache_resource
+def _build_msal_app(client_id: str, client_secret: str, authority: str) -> msal.ConfidentialClientApplication:
+    # One app per config for the whole server process: keeps MSAL's HTTP
+    # session, authority metadata and token cache across reruns.
     return msal.ConfidentialClientApplication(
-        client_id=cfg["client_id"],
-        client_credential=cfg["client_secret"],
-        authority=cfg["authority"],
+        client_id=client_id,
+        client_credential=client_secret,
+        authority=authority,
+        token_cache=_token_cache(),
     )
 
 
+def _msal_app() -> msal.ConfidentialClientApplication:
+    cfg = _require_cfg()
+    return _build_msal_app(cfg["client_id"], cfg["client_secret"], cfg["authority"])
+
+
+# The flow store is shared by every session thread; hold this for any access
+_FLOW_LOCK = threading.Lock()
+
+
 @st.cache_resource
 def _flow_store():
-    # dict[state] = flow
+    # dict[state] = (created_at, flow)
     return {}
 
 
+def _prune_flows(store: dict) -> None:
+    # caller holds _FLOW_LOCK
+    cutoff = time.time() - _FLOW_TTL_S
+    for state in [s for s, (created, _) in store.items() if created < cutoff]:
+        store.pop(state, None)
+
+
+def _safe_clear_qp() -> None:
+    try:
+        st.query_params.clear()
+    except Exception:
+        pass
+
+
 def _reset_login_state(clear_url: bool = True) -> None:
-    for k in ["ms_token", "ms_scopes"]:
+    for k in ["ms_token", "ms_scopes", "ms_flow_state", "ms_flow_scopes"]:
         st.session_state.pop(k, None)
 
     if clear_url:
-        try:
-            st.query_params.clear()
-        except Exception:
-            pass
+        _safe_clear_qp()
 
 
 def logout() -> None:
@@ -75,13 +151,20 @@ def _start_flow(app: msal.ConfidentialClientApplication, scopes: list[str]) -> t
     and return (auth_url, state).
     """
     cfg = _require_cfg()
-    flow = app.initiate_auth_code_flow(scopes=scopes, redirect_uri=cfg["redirect_uri"])
+    # Hex-only state survives any URL encoding on the round trip unchanged
+    flow = app.initiate_auth_code_flow(
+        scopes=scopes, redirect_uri=cfg["redirect_uri"], state=uuid.uuid4().hex
+    )
     state = flow.get("state")
     if not state:
         raise RuntimeError("MSAL did not return a state value.")
 
     store = _flow_store()
-    store[state] = flow
+    with _FLOW_LOCK:
+        _prune_flows(store)
+        store[state] = (time.time(), flow)
+    st.session_state["ms_flow_state"] = state
+    st.session_state["ms_flow_scopes"] = tuple(scopes)
 
     # Put only the state in the URL (small, safe)
     try:
@@ -92,61 +175,131 @@ def _start_flow(app: msal.ConfidentialClientApplication, scopes: list[str]) -> t
     return flow["auth_uri"], state
 
 
+def _ensure_flow(app: msal.ConfidentialClientApplication, scopes: list[str]) -> str:
+    """
+    Return the sign-in URL of this session's pending flow, starting a new
+    flow only when there is none, it has expired out of the store, or it
+    was started for a different scope set (it would fail redemption).
+    """
+    store = _flow_store()
+    with _FLOW_LOCK:
+        _prune_flows(store)
+        entry = store.get(st.session_state.get("ms_flow_state"))
+    if entry and st.session_state.get("ms_flow_scopes") == tuple(scopes):
+        return entry[1]["auth_uri"]
+
+    auth_url, _ = _start_flow(app, scopes)
+    return auth_url
+
+
+def _stamp_expiry(result: dict) -> dict:
+    """Record the absolute expiry (and early-refresh time) once, when the token is stored."""
+    now = int(time.time())
+    result["expires_at"] = now + int(result.get("expires_in", 3599))
+    # MSAL results carry the IdP's proactive-renewal hint as relative refresh_in
+    if result.get("refresh_in"):
+        result["refresh_on"] = now + int(result["refresh_in"])
+    return result
+
+
+def _redeem_callback(app: msal.ConfidentialClientApplication, qp: dict) -> str:
+    """
+    Redeem ?code= using the cached flow for its state. On success this stores
+    the token and reruns; otherwise it returns why the callback was rejected.
+    """
+    # Only the state the IdP echoed back counts; our own ms_state param would
+    # just get the flow found and then rejected by MSAL as a state mismatch.
+    state = qp.get("state")
+    if not state:
+        return "missing state in callback."
+
+    # Flows are keyed by state, so this lookup is the state check: anything
+    # that gets past it matches flow["state"] exactly.
+    # Popped, not read: each state is redeemable once, so a replayed or
+    # back-button callback is rejected here whatever the first outcome was.
+    store = _flow_store()
+    with _FLOW_LOCK:
+        _prune_flows(store)
+        entry = store.pop(state, None)
+    flow = entry[1] if entry else None
+    if not flow:
+        # flow not found (expired cache / new server instance / already used)
+        return "session expired."
+
+    try:
+        result = app.acquire_token_by_auth_code_flow(flow, qp)
+    except ValueError as e:
+        return str(e)
+
+    if "access_token" not in result:
+        return f"{result.get('error')} - {result.get('error_description')}"
+
+    _save_token_cache(_token_cache())
+    st.session_state["ms_token"] = _stamp_expiry(result)
+    _safe_clear_qp()
+    st.rerun()
+
+
 def login_ui(scopes: list[str] | None = None) -> None:
     """
     ONE button UI:
       - If callback has ?code=, redeem using cached flow by state
-      - Otherwise show single Sign In link_button
+      - Otherwise (or if that fails) show single Sign In link_button
     """
-    app = _msal_app()
-
     if scopes is None:
         scopes = DEFAULT_SCOPES_READONLY
     st.session_state["ms_scopes"] = scopes
 
+    # Already signed in: nothing to build or redeem
     if st.session_state.get("ms_token"):
         return
 
-    qp = st.query_params
+    app = _msal_app()
+
+    # One snapshot per render instead of a proxy lookup per key
+    qp = st.query_params.to_dict()
 
-    # Callback handling
+    # Callback handling; a rejected callback goes straight to a fresh flow
     if qp.get("code"):
-        state = qp.get("state") or qp.get(_STATE_QP_KEY)
-        if not state:
-            st.error("Login failed: missing state in callback.")
-            return
+        error = _redeem_callback(app, qp)
+        _safe_clear_qp()
+        st.warning(f"Login failed: {error} Please sign in again.")
 
-        store = _flow_store()
-        flow = store.get(state)
-        if not flow:
-            # flow not found (expired cache / new server instance)
-            st.error("Login failed: session expired. Click Sign In again.")
-            return
+    # Reuse the pending flow / show sign in
+    auth_url = _ensure_flow(app, scopes)
+    st.link_button("Sign In", auth_url, type="primary")
 
-        auth_response = {k: qp.get(k) for k in qp.keys()}
 
-        try:
-            result = app.acquire_token_by_auth_code_flow(flow, auth_response)
-        except ValueError as e:
-            st.error(f"Login failed: {e}")
-            return
+def _account_for(app: msal.ConfidentialClientApplication, token: dict) -> dict | None:
+    """
+    The MSAL app (and its cache) is shared by every session on this server,
+    so pick the account that belongs to this session's token, never accounts[0].
+    """
+    username = (token.get("id_token_claims") or {}).get("preferred_username")
+    if not username:
+        return None
+    accounts = app.get_accounts(username=username)
+    return accounts[0] if accounts else None
 
-        if "access_token" in result:
-            st.session_state["ms_token"] = result
-            try:
-                st.query_params.clear()
-            except Exception:
-                pass
-            st.rerun()
-        else:
-            err = result.get("error")
-            desc = result.get("error_description")
-            st.error(f"Login failed: {err} - {desc}")
-            return
 
-    # Start flow / show sign in
-    auth_url, _ = _start_flow(app, scopes)
-    st.link_button("Sign In", auth_url)
+def _refresh_silently(token: dict) -> dict | None:
+    app = _msal_app()
+    scopes = st.session_state.get("ms_scopes") or DEFAULT_SCOPES_READONLY
+
+    account = _account_for(app, token)
+    result = app.acquire_token_silent(scopes, account=account) if account else None
+    if (not result or "access_token" not in result) and token.get("refresh_token"):
+        # Account gone from the shared cache (e.g. lost cache file): fall back
+        # to the session's own refresh token rather than a full re-login
+        result = app.acquire_token_by_refresh_token(token["refresh_token"], scopes=scopes)
+    _save_token_cache(_token_cache())
+    if not result or "access_token" not in result:
+        return None
+
+    result.setdefault("id_token_claims", token.get("id_token_claims"))
+    # silent results carry no refresh_token; keep ours for the fallback above
+    result.setdefault("refresh_token", token.get("refresh_token"))
+    return _stamp_expiry(result)
 
 
 def get_access_token() -> str | None:
@@ -154,14 +307,22 @@ def get_access_token() -> str | None:
     if not token:
         return None
 
-    expires_at = token.get("expires_at")
-    if not expires_at:
-        expires_in = token.get("expires_in", 3599)
-        token["expires_at"] = int(time.time()) + int(expires_in)
-        expires_at = token["expires_at"]
-
-    if int(expires_at) - int(time.time()) < 120:
-        _reset_login_state(clear_url=True)
-        st.rerun()
+    now = time.time()
+    expires_at = token.get("expires_at", 0)
+    expiring = expires_at - now < 120
+    # refresh_on is stamped from refresh_in when the IdP asks for early renewal
+    if expiring or now >= token.get("refresh_on", expires_at):
+        # Use the refresh token behind MSAL's cache; only re-login if that fails
+        refreshed = _refresh_silently(token)
+        if refreshed:
+            st.session_state["ms_token"] = refreshed
+            token = refreshed
+        elif expiring:
+            _reset_login_state(clear_url=True)
+            st.rerun()
+        else:
+            # early refresh failed but the token is still good: back off
+            # instead of hitting the token endpoint on every call
+            token["refresh_on"] = now + _REFRESH_RETRY_S
 
     return token.get("access_token")
@@ -1,10 +1,24 @@
-
 """
-Wrapper page that runs your existing IR_gen.py without modifying it.
+Wrapper page that runs IR_gen.main().
 Place this file under /pages in the same project as IR_gen.py.
 """
-import runpy
+import importlib.util
+import sys
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
-runpy.run_path(str(ROOT / "IR_gen.py"), run_name="__main__")
+
+# Load IR_gen once per process; reruns just call main() again instead of
+# re-reading and re-compiling the file each time.
+if "IR_gen" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("IR_gen", ROOT / "IR_gen.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["IR_gen"] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        # don't leave a half-initialised module behind for the next rerun
+        sys.modules.pop("IR_gen", None)
+        raise
+
+sys.modules["IR_gen"].main()
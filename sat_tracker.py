@@ -1,22 +1,31 @@
+import os
 import sys
 import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import plotly.graph_objects as go
 from plotly.offline import plot as plotly_plot
+from sgp4.api import SatrecArray, jday
 from skyfield.api import load, EarthSatellite, wgs84
+from skyfield.sgp4lib import theta_GMST1982
 
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QObject, QRunnable, QThreadPool, Signal, QUrl
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
     QLabel, QPushButton, QListWidget, QListWidgetItem, QSpinBox,
     QMessageBox, QCheckBox, QGroupBox, QFormLayout, QTabWidget,
     QLineEdit, QHBoxLayout
 )
+from PySide6.QtWebEngineCore import QWebEngineSettings
 from PySide6.QtWebEngineWidgets import QWebEngineView
 
 
@@ -34,8 +43,15 @@ DEFAULT_SAT_IDS = [
     "43678", "25994"
 ]
 
+SPACE_TRACK_POOL_SIZE = 16  # kept-alive connections to space-track.org
+SPACE_TRACK_FETCH_WORKERS = 8  # concurrent TLE queries (stays under the API rate limit)
+SPACE_TRACK_BATCH_SIZE = 100   # NORAD IDs per comma-separated query
+
 GROUND_STATION = {"name": "Davao GRS", "lat": 7.1907, "lon": 125.4553}
 
+WGS84_E2 = 6.69437999014e-3  # first eccentricity squared
+TRACK_SIMPLIFY_DEG = 0.2     # max ground-track deviation dropped by simplification
+
 
 @dataclass
 class TLE:
@@ -66,6 +82,8 @@ def spacetrack_login_session(timeout: int = 25) -> requests.Session:
         raise RuntimeError("Space-Track credentials not set in script (SPACETRACK_USER / SPACETRACK_PASS).")
 
     sess = requests.Session()
+    # Login and every query reuse the same kept-alive TLS connections
+    sess.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=SPACE_TRACK_POOL_SIZE))
     r = sess.post(
         SPACE_TRACK_LOGIN_URL,
         data={"identity": SPACETRACK_USER, "password": SPACETRACK_PASS},
@@ -75,41 +93,141 @@ def spacetrack_login_session(timeout: int = 25) -> requests.Session:
     return sess
 
 
-def parse_3le(text: str, fallback_name: str) -> Optional[Tuple[str, str, str]]:
+def _norad_key(norad: str) -> str:
+    # TLE line 1 may zero-pad the catalog number; compare without padding
+    norad = norad.strip()
+    return (norad.lstrip("0") or "0") if norad.isdigit() else norad
+
+
+def parse_3le_batch(text: str) -> Dict[str, Tuple[str, str, str]]:
+    """
+    Parse a multi-satellite 3LE response into {norad: (name, line1, line2)},
+    taking the NORAD ID from line 1 (columns 3-7).
+    """
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    if len(lines) >= 3 and lines[1].startswith("1 ") and lines[2].startswith("2 "):
-        name = lines[0].strip() or fallback_name
-        return clean_sat_name(name), lines[1], lines[2]
-    if len(lines) >= 2 and lines[0].startswith("1 ") and lines[1].startswith("2 "):
-        return clean_sat_name(fallback_name), lines[0], lines[1]
-    return None
+    out: Dict[str, Tuple[str, str, str]] = {}
+    for i in range(len(lines) - 2):
+        name, l1, l2 = lines[i], lines[i + 1], lines[i + 2]
+        if l1.startswith("1 ") and l2.startswith("2 ") and not name.startswith(("1 ", "2 ")):
+            out[_norad_key(l1[2:7])] = (clean_sat_name(name), l1, l2)
+    return out
 
 
-def fetch_tle_latest(sess: requests.Session, norad: str) -> TLE:
-    # format/3le gives NAME + line1 + line2
+def fetch_tles_batch(sess: requests.Session, norad_ids: List[str]) -> Dict[str, TLE]:
+    # One query for many satellites: NORAD_CAT_ID takes a comma-separated list
     url = (
         f"{SPACE_TRACK_QUERY_BASE}/class/tle_latest/"
-        f"NORAD_CAT_ID/{norad}/ORDINAL/1/EPOCH/%3Enow-30/format/3le"
+        f"NORAD_CAT_ID/{','.join(norad_ids)}/ORDINAL/1/EPOCH/%3Enow-30/format/3le"
     )
     r = sess.get(url, timeout=25)
     r.raise_for_status()
 
-    parsed = parse_3le(r.text, fallback_name=f"NORAD {norad}")
-    if not parsed:
-        raise RuntimeError(f"No TLE returned for NORAD {norad}")
-
-    name, l1, l2 = parsed
-    return TLE(norad=norad, name=name, line1=l1, line2=l2)
+    parsed = parse_3le_batch(r.text)
+    out: Dict[str, TLE] = {}
+    for norad in norad_ids:
+        found = parsed.get(_norad_key(norad))
+        if not found:
+            raise RuntimeError(f"No TLE returned for NORAD {norad}")
+        name, l1, l2 = found
+        out[norad] = TLE(norad=norad, name=name, line1=l1, line2=l2)
+    return out
 
 
 def fetch_all_tles(norad_ids: List[str]) -> Dict[str, TLE]:
     sess = spacetrack_login_session()
+    batches = [
+        norad_ids[i:i + SPACE_TRACK_BATCH_SIZE]
+        for i in range(0, len(norad_ids), SPACE_TRACK_BATCH_SIZE)
+    ]
+    # Usually a single query; very long ID lists are split and overlapped.
+    # map() keeps input order and re-raises the first failure.
+    with ThreadPoolExecutor(max_workers=SPACE_TRACK_FETCH_WORKERS) as ex:
+        results = list(ex.map(lambda b: fetch_tles_batch(sess, b), batches))
+
     out: Dict[str, TLE] = {}
-    for n in norad_ids:
-        out[n] = fetch_tle_latest(sess, n)
+    for res in results:
+        out.update(res)
     return out
 
 
+# ----------------------------------------------------------
+# SKYFIELD RESOURCES (loaded once per process)
+# ----------------------------------------------------------
+@lru_cache(maxsize=1)
+def get_timescale():
+    return load.timescale()
+
+
+@lru_cache(maxsize=1)
+def get_ephemeris():
+    # de421.bsp is ~17 MB; parse it once, not on every render
+    return load("de421.bsp")
+
+
+# ----------------------------------------------------------
+# FAST SUBPOINT (numpy, no skyfield frame objects)
+# ----------------------------------------------------------
+def _fast_subpoint(r_teme_km: np.ndarray, gmst: float | np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (lat_deg, lon_deg) under TEME positions of shape (N, 3): rotate by
+    Greenwich sidereal time into the Earth frame and take a closed-form
+    WGS84 latitude. gmst (radians) is one angle for all rows, or an array
+    of shape (N,) with one per row (e.g. one per sample of a track).
+    Good to a few km, plenty for a map marker.
+    """
+    x, y, z = r_teme_km.T
+    lon = np.degrees(np.arctan2(y, x) - gmst)
+    lon = (lon + 180.0) % 360.0 - 180.0
+    lat = np.degrees(np.arctan2(z, (1.0 - WGS84_E2) * np.hypot(x, y)))
+    return lat, lon
+
+
+# ----------------------------------------------------------
+# GROUND TRACK SIMPLIFICATION (Ramer-Douglas-Peucker)
+# ----------------------------------------------------------
+def _rdp_keep(pts: np.ndarray, tol: float) -> np.ndarray:
+    """Boolean mask of the points RDP keeps for an (N, 2) polyline."""
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = pts[b] - pts[a]
+        rel = pts[a + 1:b] - pts[a]
+        seg_len = np.hypot(*seg)
+        if seg_len == 0.0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / seg_len
+        i = int(np.argmax(dist))
+        if dist[i] > tol:
+            m = a + 1 + i
+            keep[m] = True
+            stack += [(a, m), (m, b)]
+    return keep
+
+
+def simplify_track(lons: np.ndarray, lats: np.ndarray, tol_deg: float = TRACK_SIMPLIFY_DEG) -> Tuple[List[float], List[float]]:
+    """
+    Drop track points that sit within tol_deg of the line through their
+    neighbours. Pieces either side of a dateline jump are simplified
+    separately so the wrap points are always kept.
+    """
+    breaks = np.flatnonzero(np.abs(np.diff(lons)) > 180.0) + 1
+    out_lons: List[float] = []
+    out_lats: List[float] = []
+    for idx in np.split(np.arange(len(lons)), breaks):
+        if len(idx) == 0:
+            continue
+        pts = np.column_stack((lons[idx], lats[idx]))
+        kept = pts[_rdp_keep(pts, tol_deg)]
+        out_lons += kept[:, 0].tolist()
+        out_lats += kept[:, 1].tolist()
+    return out_lons, out_lats
+
+
 # ----------------------------------------------------------
 # Helpers: outlined text via 2 traces (black behind white)
 # ----------------------------------------------------------
@@ -146,10 +264,10 @@ def build_map_html_with_live_hooks_mapbox(
     minutes_window: int,
     tail_len: int
 ) -> Tuple[str, List[dict]]:
-    ts = load.timescale()
+    ts = get_timescale()
     t_now = ts.now()
 
-    eph = load("de421.bsp")
+    eph = get_ephemeris()
     earth = eph["earth"]
     sun = eph["sun"]
     moon = eph["moon"]
@@ -161,17 +279,14 @@ def build_map_html_with_live_hooks_mapbox(
 
     fig = go.Figure()
 
+    # Track sample times as sgp4 (jd, fraction) arrays: one per minute offset
     base = datetime.utcnow()
     mins = np.arange(-minutes_window, minutes_window + 1, 1, dtype=int)
-    dt_list = [base + timedelta(minutes=int(m)) for m in mins]
-    times = ts.utc(
-        [d.year for d in dt_list],
-        [d.month for d in dt_list],
-        [d.day for d in dt_list],
-        [d.hour for d in dt_list],
-        [d.minute for d in dt_list],
-        [d.second for d in dt_list],
-    )
+    jd0, fr0 = jday(base.year, base.month, base.day, base.hour, base.minute,
+                    base.second + base.microsecond / 1e6)
+    jd = np.full(len(mins), jd0)
+    fr = fr0 + mins / 1440.0
+    gmst, _ = theta_GMST1982(jd, fr)
 
     # Ground Station marker + label
     fig.add_trace(go.Scattermapbox(
@@ -229,82 +344,101 @@ def build_map_html_with_live_hooks_mapbox(
 
     sat_trace_meta: List[dict] = []
 
-    for tle in selected_tles:
-        sat = EarthSatellite(tle.line1, tle.line2, tle.name, ts)
-
-        sp_track = sat.at(times).subpoint()
-        track_lons = sp_track.longitude.degrees.tolist()
-        track_lats = sp_track.latitude.degrees.tolist()
-
-        fig.add_trace(go.Scattermapbox(
-            lon=track_lons,
-            lat=track_lats,
-            mode="lines",
-            line=dict(width=2, color="magenta"),
-            name=f"{tle.name} track",
-            hoverinfo="skip"
-        ))
-
-        sp_now = sat.at(t_now).subpoint()
-        cur_lon = float(sp_now.longitude.degrees)
-        cur_lat = float(sp_now.latitude.degrees)
-
-        # Tail (updated live)
-        tail_i = len(fig.data)
-        fig.add_trace(go.Scattermapbox(
-            lon=[cur_lon],
-            lat=[cur_lat],
-            mode="lines",
-            line=dict(width=3, color="cyan"),
-            name=f"{tle.name} tail",
-            hoverinfo="skip",
-            showlegend=False
-        ))
-
-        # Marker (updated live)
-        # ✅ FIX: remove marker line=... (unsupported in your plotly)
-        marker_i = len(fig.data)
-        fig.add_trace(go.Scattermapbox(
-            lon=[cur_lon],
-            lat=[cur_lat],
-            mode="markers",
-            marker=dict(size=10, color="cyan"),
-            name=tle.name,
-            hovertext=[f"{tle.name} (NORAD {tle.norad})"],
-            hoverinfo="text"
-        ))
-
-        # Label traces updated live (2 layers)
-        label_black_i = len(fig.data)
-        fig.add_trace(go.Scattermapbox(
-            lon=[cur_lon],
-            lat=[cur_lat],
-            mode="text",
-            text=[tle.name],
-            textposition="top center",
-            textfont=dict(size=16, color="black"),
-            showlegend=False,
-            hoverinfo="skip"
-        ))
-        label_white_i = len(fig.data)
-        fig.add_trace(go.Scattermapbox(
-            lon=[cur_lon],
-            lat=[cur_lat],
-            mode="text",
-            text=[tle.name],
-            textposition="top center",
-            textfont=dict(size=13, color="white"),
-            showlegend=False,
-            hoverinfo="skip"
-        ))
-
-        sat_trace_meta.append({
-            "norad": tle.norad,
-            "tail_i": tail_i,
-            "marker_i": marker_i,
-            "label_black_i": label_black_i,
-            "label_white_i": label_white_i
-        })
+    # Every track in one C call: err is (N, T), positions (N, T, 3) TEME km
+    sat_array = SatrecArray([EarthSatellite(t.line1, t.line2, t.name, ts).model for t in selected_tles])
+    err, r_teme, _v = sat_array.sgp4(jd, fr)
+
+    # All satellites share one trace per layer (track / tail / marker / labels):
+    # polylines are joined with None breaks, points are plain arrays indexed
+    # by each satellite's "idx". Trace count stays constant as sats are added.
+    track_lons: List[Optional[float]] = []
+    track_lats: List[Optional[float]] = []
+    cur_lons: List[float] = []
+    cur_lats: List[float] = []
+    names: List[str] = []
+    hovertexts: List[str] = []
+
+    for i, tle in enumerate(selected_tles):
+        lat, lon = _fast_subpoint(r_teme[i], gmst)
+
+        ok = err[i] == 0  # drop samples sgp4 could not propagate
+        simple_lons, simple_lats = simplify_track(lon[ok], lat[ok])
+        track_lons += simple_lons + [None]
+        track_lats += simple_lats + [None]
+
+        # "Now" is the centre sample of the track (offset 0 min); live ticks
+        # take over from there
+        cur_lons.append(float(lon[minutes_window]))
+        cur_lats.append(float(lat[minutes_window]))
+
+        names.append(tle.name)
+        hovertexts.append(f"{tle.name} (NORAD {tle.norad})")
+        sat_trace_meta.append({"norad": tle.norad, "idx": len(sat_trace_meta)})
+
+    fig.add_trace(go.Scattermapbox(
+        lon=track_lons,
+        lat=track_lats,
+        mode="lines",
+        line=dict(width=2, color="magenta"),
+        name="Ground tracks",
+        hoverinfo="skip"
+    ))
+
+    # Tails (updated live)
+    tail_i = len(fig.data)
+    fig.add_trace(go.Scattermapbox(
+        lon=[],
+        lat=[],
+        mode="lines",
+        line=dict(width=3, color="cyan"),
+        name="Tails",
+        hoverinfo="skip",
+        showlegend=False
+    ))
+
+    # Markers (updated live)
+    # ✅ FIX: remove marker line=... (unsupported in your plotly)
+    marker_i = len(fig.data)
+    fig.add_trace(go.Scattermapbox(
+        lon=cur_lons,
+        lat=cur_lats,
+        mode="markers",
+        marker=dict(size=10, color="cyan"),
+        name="Satellites",
+        hovertext=hovertexts,
+        hoverinfo="text"
+    ))
+
+    # Label traces updated live (2 layers)
+    label_black_i = len(fig.data)
+    fig.add_trace(go.Scattermapbox(
+        lon=cur_lons,
+        lat=cur_lats,
+        mode="text",
+        text=names,
+        textposition="top center",
+        textfont=dict(size=16, color="black"),
+        showlegend=False,
+        hoverinfo="skip"
+    ))
+    label_white_i = len(fig.data)
+    fig.add_trace(go.Scattermapbox(
+        lon=cur_lons,
+        lat=cur_lats,
+        mode="text",
+        text=names,
+        textposition="top center",
+        textfont=dict(size=13, color="white"),
+        showlegend=False,
+        hoverinfo="skip"
+    ))
+
+    live_traces = {
+        "tail_i": tail_i,
+        "marker_i": marker_i,
+        "label_black_i": label_black_i,
+        "label_white_i": label_white_i
+    }
 
     fig.update_layout(
         mapbox=dict(
@@ -328,6 +462,8 @@ def build_map_html_with_live_hooks_mapbox(
 
     div = plotly_plot(fig, output_type="div", include_plotlyjs="cdn")
     meta_json = json.dumps(sat_trace_meta)
+    traces_json = json.dumps(live_traces)
+    cur_json = json.dumps({"lons": cur_lons, "lats": cur_lats})
     tail_len_js = int(tail_len)
 
     page = f"""
@@ -349,9 +485,16 @@ def build_map_html_with_live_hooks_mapbox(
           }}
 
           const SAT_META = {meta_json};
+          const TRACES = {traces_json};
           const TAIL_LEN = {tail_len_js};
+          const CUR = {cur_json};
+          const SAT_INDEX = {{}};
           const tailBuffers = {{}};
 
+          SAT_META.forEach(s => {{
+            SAT_INDEX[s.norad] = s.idx;
+          }});
+
           function initTails() {{
             SAT_META.forEach(s => {{
               tailBuffers[s.norad] = {{ lons: [], lats: [] }};
@@ -369,23 +512,42 @@ def build_map_html_with_live_hooks_mapbox(
             }}
           }}
 
-          window.updateSatellite = function(norad, lon, lat) {{
+          // One restyle for the four merged live traces; tails are joined
+          // with null breaks so they don't connect to each other.
+          function redrawLive(plotDiv) {{
+            const tailLons = [], tailLats = [];
+            SAT_META.forEach(s => {{
+              const b = tailBuffers[s.norad];
+              tailLons.push(...b.lons, null);
+              tailLats.push(...b.lats, null);
+            }});
+            Plotly.restyle(
+              plotDiv,
+              {{
+                lon: [tailLons, CUR.lons.slice(), CUR.lons.slice(), CUR.lons.slice()],
+                lat: [tailLats, CUR.lats.slice(), CUR.lats.slice(), CUR.lats.slice()]
+              }},
+              [TRACES.tail_i, TRACES.marker_i, TRACES.label_black_i, TRACES.label_white_i]
+            );
+          }}
+
+          // updates: [{{norad, lon, lat}}, ...] for one tick -> one restyle
+          window.updateSatellitesBatch = function(updates) {{
             const plotDiv = getPlotDiv();
             if (!plotDiv) return;
 
-            if (!tailBuffers[norad]) {{
-              tailBuffers[norad] = {{ lons: [], lats: [] }};
-            }}
-            pushTail(norad, lon, lat);
-
-            const s = SAT_META.find(x => x.norad === norad);
-            if (!s) return;
+            updates.forEach(u => {{
+              const i = SAT_INDEX[u.norad];
+              if (i === undefined) return;
+              pushTail(u.norad, u.lon, u.lat);
+              CUR.lons[i] = u.lon;
+              CUR.lats[i] = u.lat;
+            }});
+            redrawLive(plotDiv);
+          }}
 
-            const b = tailBuffers[norad];
-            Plotly.restyle(plotDiv, {{ lon: [b.lons], lat: [b.lats] }}, [s.tail_i]);
-            Plotly.restyle(plotDiv, {{ lon: [[lon]], lat: [[lat]] }}, [s.marker_i]);
-            Plotly.restyle(plotDiv, {{ lon: [[lon]], lat: [[lat]] }}, [s.label_black_i]);
-            Plotly.restyle(plotDiv, {{ lon: [[lon]], lat: [[lat]] }}, [s.label_white_i]);
+          window.updateSatellite = function(norad, lon, lat) {{
+            window.updateSatellitesBatch([{{ norad: norad, lon: lon, lat: lat }}]);
           }}
 
           window.resetTails = function() {{
@@ -401,6 +563,62 @@ def build_map_html_with_live_hooks_mapbox(
     return page, sat_trace_meta
 
 
+@lru_cache(maxsize=8)
+def _map_html_for_minute(
+    tle_key: Tuple[Tuple[str, str, str, str], ...],
+    minutes_window: int,
+    tail_len: int,
+    minute_bucket: str
+) -> Tuple[str, List[dict]]:
+    return build_map_html_with_live_hooks_mapbox(
+        [TLE(*k) for k in tle_key], minutes_window, tail_len
+    )
+
+
+def build_map_html_cached(
+    selected_tles: List[TLE],
+    minutes_window: int,
+    tail_len: int
+) -> Tuple[str, List[dict]]:
+    """
+    Same page as build_map_html_with_live_hooks_mapbox, reused for identical
+    inputs within the same UTC minute (the live hooks move markers anyway).
+    """
+    tle_key = tuple(sorted((t.norad, t.name, t.line1, t.line2) for t in selected_tles))
+    minute_bucket = datetime.utcnow().strftime("%Y-%m-%d %H:%M")
+    return _map_html_for_minute(tle_key, int(minutes_window), int(tail_len), minute_bucket)
+
+
+# ----------------------------------------------------------
+# BACKGROUND RENDER (propagation + HTML off the UI thread)
+# ----------------------------------------------------------
+class RenderSignals(QObject):
+    done = Signal(int, str)    # (render seq, page html)
+    failed = Signal(int, str)  # (render seq, error message)
+
+
+class RenderTask(QRunnable):
+    def __init__(self, seq: int, selected_tles: List[TLE], minutes_window: int, tail_len: int):
+        super().__init__()
+        self.seq = seq
+        self.selected_tles = selected_tles
+        self.minutes_window = minutes_window
+        self.tail_len = tail_len
+        self.signals = RenderSignals()
+
+    def run(self):
+        try:
+            page, _meta = build_map_html_cached(
+                selected_tles=self.selected_tles,
+                minutes_window=self.minutes_window,
+                tail_len=self.tail_len
+            )
+        except Exception as e:
+            self.signals.failed.emit(self.seq, str(e))
+            return
+        self.signals.done.emit(self.seq, page)
+
+
 # ----------------------------------------------------------
 # GUI
 # ----------------------------------------------------------
@@ -412,8 +630,10 @@ class MainWindow(QMainWindow):
         self.tle_store: Dict[str, TLE] = {}
         self.selected_norads: List[str] = []
 
-        self.ts = load.timescale()
+        self.ts = get_timescale()
         self.sat_objects: Dict[str, EarthSatellite] = {}
+        # All selected Satrecs in one C array, aligned with selected_norads
+        self.sat_array: Optional[SatrecArray] = None
 
         self.live_timer = QTimer(self)
         self.live_timer.timeout.connect(self.live_tick)
@@ -421,12 +641,23 @@ class MainWindow(QMainWindow):
         self.web_loaded = False
         self.sat_ids: List[str] = list(DEFAULT_SAT_IDS)
 
+        # Only the newest render request is shown; older results are dropped
+        self._render_seq = 0
+        self._render_task: Optional[RenderTask] = None
+        # Pages are loaded from this file rather than pushed through setHtml
+        # (which caps content at 2 MB and parses it all in one go)
+        self._page_path = Path(tempfile.gettempdir()) / f"sattrack-{os.getpid()}.html"
+
         tabs = QTabWidget()
         self.setCentralWidget(tabs)
 
         view_tab = QWidget()
         view_layout = QVBoxLayout(view_tab)
         self.web = QWebEngineView()
+        # file:// page still needs the plotly CDN script and the imagery tiles
+        self.web.settings().setAttribute(
+            QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True
+        )
         self.web.loadFinished.connect(self.on_web_load_finished)
         view_layout.addWidget(self.web)
         tabs.addTab(view_tab, "View")
@@ -547,7 +778,13 @@ class MainWindow(QMainWindow):
             for i in range(self.list_widget.count()):
                 self.list_widget.item(i).setSelected(True)
 
-            self.set_status(f"TLEs loaded: {len(self.tle_store)} satellites. Render when ready.")
+            if self._refresh_live_elements():
+                self.set_status(
+                    f"TLEs loaded: {len(self.tle_store)} satellites. "
+                    "Live map now uses the new elements."
+                )
+            else:
+                self.set_status(f"TLEs loaded: {len(self.tle_store)} satellites. Render when ready.")
         except Exception as e:
             QMessageBox.critical(self, "Fetch failed", str(e))
             self.set_status("Fetch failed.")
@@ -573,20 +810,61 @@ class MainWindow(QMainWindow):
                     selected_tles.append(tle)
                     self.selected_norads.append(norad)
                     self.sat_objects[norad] = EarthSatellite(tle.line1, tle.line2, tle.name, self.ts)
+            self._rebuild_sat_array()
 
             self.web_loaded = False
             self.set_status(f"Rendering {len(selected_tles)} satellite(s)...")
 
-            page, _meta = build_map_html_with_live_hooks_mapbox(
-                selected_tles=selected_tles,
+            self._render_seq += 1
+            task = RenderTask(
+                self._render_seq,
+                selected_tles,
                 minutes_window=int(self.track_window.value()),
                 tail_len=int(self.tail_len.value())
             )
-            self.web.setHtml(page)
+            task.signals.done.connect(self.on_render_done)
+            task.signals.failed.connect(self.on_render_failed)
+            self._render_task = task
+            QThreadPool.globalInstance().start(task)
         except Exception as e:
             QMessageBox.critical(self, "Render failed", str(e))
             self.set_status("Render failed.")
 
+    def on_render_done(self, seq: int, page: str):
+        if seq != self._render_seq:
+            return
+        try:
+            self._page_path.write_text(page, encoding="utf-8")
+        except OSError as e:
+            QMessageBox.critical(self, "Render failed", str(e))
+            self.set_status("Render failed.")
+            return
+        self.web.load(QUrl.fromLocalFile(str(self._page_path)))
+
+    def on_render_failed(self, seq: int, msg: str):
+        if seq != self._render_seq:
+            return
+        QMessageBox.critical(self, "Render failed", msg)
+        self.set_status("Render failed.")
+
+    def _refresh_live_elements(self) -> bool:
+        """
+        Swap fresh TLEs into the satellites already on the map, so live ticks
+        use them without rebuilding and reloading the page. Only when every
+        shown satellite is still in the store; otherwise a render is needed.
+        """
+        if not self.selected_norads or any(n not in self.tle_store for n in self.selected_norads):
+            return False
+        for norad in self.selected_norads:
+            tle = self.tle_store[norad]
+            self.sat_objects[norad] = EarthSatellite(tle.line1, tle.line2, tle.name, self.ts)
+        self._rebuild_sat_array()
+        return True
+
+    def _rebuild_sat_array(self):
+        models = [self.sat_objects[n].model for n in self.selected_norads if n in self.sat_objects]
+        self.sat_array = SatrecArray(models) if models else None
+
     def on_web_load_finished(self, ok: bool):
         self.web_loaded = bool(ok)
         if not ok:
@@ -603,27 +881,42 @@ class MainWindow(QMainWindow):
             self.set_status("Rendered. Live update OFF.")
 
     def live_tick(self):
-        if not self.web_loaded or not self.selected_norads:
+        if not self.web_loaded or self.sat_array is None:
             return
         try:
-            t_now = self.ts.now()
-            for norad in self.selected_norads:
-                sat = self.sat_objects.get(norad)
-                if sat is None:
-                    continue
+            # One C call propagates every satellite; one GMST for all of them
+            # (UT1 - UTC < 1 s, well below what the map can show)
+            now = datetime.utcnow()
+            jd, fr = jday(now.year, now.month, now.day, now.hour, now.minute,
+                          now.second + now.microsecond / 1e6)
+            gmst, _ = theta_GMST1982(jd, fr)
+
+            err, r, _v = self.sat_array.sgp4(np.array([jd]), np.array([fr]))
+            ok = err[:, 0] == 0
+            if not ok.any():
+                return
 
-                sp = sat.at(t_now).subpoint()
-                lon = float(sp.longitude.degrees)
-                lat = float(sp.latitude.degrees)
+            norads = [n for n, good in zip(self.selected_norads, ok) if good]
+            lats, lons = _fast_subpoint(r[ok, 0, :], gmst)
+            updates = [
+                {"norad": n, "lon": float(lon), "lat": float(lat)}
+                for n, lon, lat in zip(norads, lons, lats)
+            ]
 
-                js = f"if (window.updateSatellite) window.updateSatellite({json.dumps(norad)}, {lon}, {lat});"
-                self.web.page().runJavaScript(js)
+            # One JS round trip (and one restyle) per tick for all satellites
+            js = f"if (window.updateSatellitesBatch) window.updateSatellitesBatch({json.dumps(updates)});"
+            self.web.page().runJavaScript(js)
 
         except Exception as e:
             self.live_timer.stop()
             QMessageBox.critical(self, "Live update failed", str(e))
             self.set_status("Live update failed (stopped).")
 
+    def closeEvent(self, event):
+        # the rendered page is several MB; don't leave it behind in the temp dir
+        self._page_path.unlink(missing_ok=True)
+        super().closeEvent(event)
+
 
 def main():
     app = QApplication(sys.argv)
@@ -0,0 +1,235 @@
+import asyncio
+import functools
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+
+# ===================== CONFIGURATION =====================
+
+SERVICE_ACCOUNT_FILE = "C:\\Users\\user-307E6E3400\\Desktop\\Python Scripts\\GS App\\keys\\endless-theorem-421101-fe0721f63c55.json"
+SPREADSHEET_ID = "1iR49Cx05EWtbG__o_-gl0SXvHgg5qNBhJ04q7HZN5dQ"
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+SHEETS_API = "https://sheets.googleapis.com/v4/spreadsheets"
+
+FETCH_WORKERS = 16       # max concurrent connections to the Sheets API
+BATCH_GET_CHUNK = 50     # ranges per batchGet request (keeps the URL short)
+
+# Cells exactly as Sheets displays them (TRUE, 007, 1.50, 12%), all strings
+COLUMN_B_PARAMS = {
+    "majorDimension": "COLUMNS",
+    "valueRenderOption": "FORMATTED_VALUE",
+}
+
+# Access token cache (owner-only file); reused while it has > TOKEN_MIN_TTL_S left
+TOKEN_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "gs-app", "token.json")
+TOKEN_MIN_TTL_S = 300
+
+# 429 (rate limited) responses are retried with exponential backoff + jitter
+RETRY_MAX = 5
+RETRY_BASE_S = 0.5
+
+# =========================================================
+
+
+def load_cached_token(creds):
+    """
+    Seed service-account creds with a still-valid access token from disk,
+    skipping the JWT sign + token exchange on startup. The creds keep their
+    key, so they refresh normally once this token runs out.
+    """
+    try:
+        with open(TOKEN_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("account") != creds.service_account_email or data.get("scopes") != SCOPES:
+            return
+        expiry = datetime.fromisoformat(data["expiry"])
+    except Exception:
+        return
+
+    if (expiry - datetime.utcnow()).total_seconds() > TOKEN_MIN_TTL_S:
+        creds.token = data["token"]
+        creds.expiry = expiry
+
+
+def save_cached_token(creds):
+    if not creds.token or not creds.expiry:
+        return
+    data = {
+        "account": creds.service_account_email,
+        "scopes": SCOPES,
+        "token": creds.token,
+        "expiry": creds.expiry.isoformat(),
+    }
+    try:
+        os.makedirs(os.path.dirname(TOKEN_CACHE_PATH), exist_ok=True)
+        fd = os.open(TOKEN_CACHE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    except OSError:
+        pass
+
+
+def write_text_file(path, text):
+    """
+    Encode once and write bytes, skipping the text-layer encoder/newline pass.
+    Line endings still follow the platform, as text mode did before.
+    """
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    with open(path, "wb") as f:
+        f.write(text.encode("utf-8"))
+
+
+def column_b_range(sheet_name):
+    """A1 range for column B of a sheet; quotes in titles are doubled."""
+    return "'" + sheet_name.replace("'", "''") + "'!B:B"
+
+
+def column_b_text(values, skip_blanks=False):
+    """
+    Cells joined one per line, without trailing blank cells. values is the
+    cached list as Sheets returned it and is left untouched.
+    """
+    end = len(values)
+    while end and values[end - 1] == "":
+        end -= 1
+    cells = itertools.islice(values, end)
+    if skip_blanks:
+        cells = filter(None, cells)
+    return "\n".join(cells)
+
+
+def retry_delay(attempt, retry_after=None):
+    """Seconds to wait before retry `attempt`; Retry-After (seconds or HTTP-date) wins."""
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return (2 ** attempt) * RETRY_BASE_S + random.random() * 0.1
+
+
+class SheetsClient:
+    """
+    Sheets REST client for the Tk apps. Network I/O runs on a background
+    asyncio loop so Tk never blocks; submit() schedules a coroutine on it.
+    """
+
+    def __init__(self):
+        self.creds = None
+        self._http = None
+        self._token_lock = None
+        self._colB_pending = {}  # sheet title -> in-flight prefetch (loop thread only)
+
+        self._pool = ThreadPoolExecutor(max_workers=2)  # key file read / token refresh
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._async_runner, daemon=True).start()
+
+    # -------- background loop --------
+
+    def _async_runner(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _in_pool(self, fn, *args, **kwargs):
+        return self._loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    @property
+    def ready(self):
+        return self._http is not None
+
+    def close(self):
+        if self._http is not None:
+            try:
+                self.submit(self._http.close()).result(timeout=2)
+            except Exception:
+                pass
+
+    # -------- Sheets API --------
+
+    def _load_credentials(self):
+        creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+        load_cached_token(creds)
+        return creds
+
+    async def init(self):
+        """Load service account credentials and open one long-lived HTTP session."""
+        self.creds = await self._in_pool(self._load_credentials)
+        self._token_lock = asyncio.Lock()
+        self._http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=FETCH_WORKERS),
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+
+    async def _auth_headers(self):
+        async with self._token_lock:
+            if not self.creds.valid:
+                await self._in_pool(self.creds.refresh, Request())
+                save_cached_token(self.creds)
+        return {"Authorization": f"Bearer {self.creds.token}"}
+
+    async def _sheets_get(self, path, params):
+        """GET {SHEETS_API}/{SPREADSHEET_ID}{path} and return the decoded JSON."""
+        for attempt in range(RETRY_MAX):
+            headers = await self._auth_headers()
+            async with self._http.get(f"{SHEETS_API}/{SPREADSHEET_ID}{path}", params=params, headers=headers) as resp:
+                if resp.status == 429 and attempt < RETRY_MAX - 1:
+                    delay = retry_delay(attempt, resp.headers.get("Retry-After"))
+                else:
+                    resp.raise_for_status()
+                    return await resp.json()
+            await asyncio.sleep(delay)
+
+    async def fetch_sheet_titles(self):
+        meta = await self._sheets_get("", {"fields": "sheets.properties.title"})
+        return [sh["properties"]["title"] for sh in meta.get("sheets", [])]
+
+    async def _batch_get_column_b(self, sheet_names):
+        params = [("ranges", column_b_range(n)) for n in sheet_names] + list(COLUMN_B_PARAMS.items())
+        resp = await self._sheets_get("/values:batchGet", params)
+        return {name: (vr.get("values") or [[]])[0] for name, vr in zip(sheet_names, resp.get("valueRanges", []))}
+
+    async def prefetch_column_b(self, sheet_names):
+        """
+        Column B of every sheet via batchGet, chunks fetched concurrently.
+        Returns (values by sheet title, exceptions from failed chunks).
+        """
+        chunks = [sheet_names[i:i + BATCH_GET_CHUNK] for i in range(0, len(sheet_names), BATCH_GET_CHUNK)]
+        futures = [asyncio.ensure_future(self._batch_get_column_b(c)) for c in chunks]
+        self._colB_pending = {name: fut for chunk, fut in zip(chunks, futures) for name in chunk}
+
+        parts = await asyncio.gather(*futures, return_exceptions=True)
+        self._colB_pending = {}
+
+        cache = {}
+        errors = []
+        for part in parts:
+            if isinstance(part, Exception):
+                errors.append(part)
+            else:
+                cache.update(part)
+        return cache, errors
+
+    async def column_b(self, sheet_name):
+        pending = self._colB_pending.get(sheet_name)
+        if pending is not None:
+            # Startup prefetch is still running for this sheet; wait for it
+            return (await pending).get(sheet_name, [])
+        return (await self._batch_get_column_b([sheet_name])).get(sheet_name, [])
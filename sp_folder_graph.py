@@ -1,6 +1,157 @@
+import hashlib
+import io
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from typing import BinaryIO
+from urllib.parse import quote
+
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 GRAPH_BASE = "https://graph.microsoft.com/v1.0"
+BATCH_MAX = 20  # Graph JSON batching limit per $batch request
+
+# One pooled session for the process: Graph calls reuse kept-alive TLS
+# connections instead of a fresh handshake per request.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=20))
+
+# Throttled / briefly unavailable responses are retried with backoff
+RETRY_STATUSES = frozenset({429, 503, 504})
+RETRY_MAX = 5
+RETRY_BASE_S = 0.5
+
+
+def _retry_delay(attempt: int, retry_after: str | None) -> float:
+    """Seconds before retry `attempt`; Retry-After (seconds or HTTP-date) wins."""
+    jitter = random.uniform(0, 0.25)
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after)) + jitter
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()) + jitter
+        except (TypeError, ValueError):
+            pass
+    return (2 ** attempt) * RETRY_BASE_S + jitter
+
+
+def _send(method: str, url: str, **kwargs) -> requests.Response:
+    for attempt in range(RETRY_MAX):
+        r = _SESSION.request(method, url, **kwargs)
+        if r.status_code not in RETRY_STATUSES or attempt == RETRY_MAX - 1:
+            return r
+        time.sleep(_retry_delay(attempt, r.headers.get("Retry-After")))
+        r.close()
+
+
+# GETs in flight, keyed by (url, auth header, params); see _request
+_INFLIGHT: dict[tuple, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _response_copy(r: requests.Response) -> requests.Response:
+    """A detached Response with the same status, headers and (already read) body."""
+    c = requests.Response()
+    c.status_code = r.status_code
+    c.reason = r.reason
+    c.url = r.url
+    c.encoding = r.encoding
+    c.headers = r.headers.copy()
+    c.request = r.request
+    c.elapsed = r.elapsed
+    c._content = r.content
+    return c
+
+
+def _request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    _send with singleflight for GETs: concurrent identical GETs (same URL,
+    params and token) share one HTTP call. Each follower gets its own copy
+    of the response. Params that aren't a plain dict skip coalescing.
+    """
+    params = kwargs.get("params") or {}
+    if method != "GET" or not isinstance(params, dict):
+        return _send(method, url, **kwargs)
+
+    headers = kwargs.get("headers") or {}
+    key = (url, headers.get("Authorization"), tuple(sorted((str(k), str(v)) for k, v in params.items())))
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(key)
+        leader = fut is None
+        if leader:
+            fut = _INFLIGHT[key] = Future()
+    if not leader:
+        return _response_copy(fut.result())
+
+    try:
+        r = _send(method, url, **kwargs)
+        r.content  # read the body once here so copies can be made from it
+        fut.set_result(_response_copy(r))
+        return r
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+
+
+class _TTLCache:
+    """Small thread-safe cache with a size bound and per-entry expiry."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            expires, value = hit
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+# Site/drive ids never change for a site; found items are kept briefly.
+# Keys carry a hash of the caller's token, never the token itself.
+_SITE_CACHE = _TTLCache(maxsize=256, ttl=3600)
+_ITEM_CACHE = _TTLCache(maxsize=1024, ttl=300)
+# Folder names per parent path, for duplicate checks while the user types
+_NAME_CACHE = _TTLCache(maxsize=256, ttl=60)
+
+
+def _token_key(token: str) -> str:
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _json(r: requests.Response):
+    # orjson parses the raw body bytes directly, noticeably faster than r.json()
+    return orjson.loads(r.content)
 
 
 def _headers(token: str, extra: dict | None = None):
@@ -10,7 +161,33 @@ def _headers(token: str, extra: dict | None = None):
     return h
 
 
+def graph_batch(token: str, reqs: list[dict]) -> dict[str, dict]:
+    """
+    POST sub-requests to /$batch (BATCH_MAX per call) and return
+    {id: {"status": ..., "body": ...}}. URLs are relative to GRAPH_BASE;
+    dependsOn only works within one chunk, so keep chains <= BATCH_MAX.
+    """
+    out = {}
+    for i in range(0, len(reqs), BATCH_MAX):
+        r = _request(
+            "POST",
+            f"{GRAPH_BASE}/$batch",
+            headers=_headers(token, {"Content-Type": "application/json"}),
+            data=orjson.dumps({"requests": reqs[i:i + BATCH_MAX]}),
+            timeout=60,
+        )
+        r.raise_for_status()
+        for resp in _json(r).get("responses", []):
+            out[resp["id"]] = resp
+    return out
+
+
 def resolve_site_id(token: str, site_url: str) -> str:
+    key = ("site", _token_key(token), site_url)
+    cached = _SITE_CACHE.get(key)
+    if cached:
+        return cached
+
     site_url = site_url.rstrip("/")
     if "://" in site_url:
         site_url = site_url.split("://", 1)[1]
@@ -18,77 +195,327 @@ def resolve_site_id(token: str, site_url: str) -> str:
     path = "/" + path
 
     url = f"{GRAPH_BASE}/sites/{host}:{path}"
-    r = requests.get(url, headers=_headers(token), timeout=60)
+    r = _request("GET", url, headers=_headers(token), timeout=60)
     r.raise_for_status()
-    return r.json()["id"]
+    site_id = _json(r)["id"]
+    _SITE_CACHE.set(key, site_id)
+    return site_id
 
 
 def get_default_drive_id(token: str, site_id: str) -> str:
+    key = ("drive", _token_key(token), site_id)
+    cached = _SITE_CACHE.get(key)
+    if cached:
+        return cached
+
     url = f"{GRAPH_BASE}/sites/{site_id}/drive"
-    r = requests.get(url, headers=_headers(token), timeout=60)
+    r = _request("GET", url, headers=_headers(token), timeout=60)
+    r.raise_for_status()
+    drive_id = _json(r)["id"]
+    _SITE_CACHE.set(key, drive_id)
+    return drive_id
+
+
+def _item_key(token: str, drive_id: str, path: str) -> tuple:
+    return (_token_key(token), drive_id, path.strip("/"))
+
+
+# Only the fields callers read, and Graph's largest page size
+_CHILD_PARAMS = {"$select": "id,name,folder,file,size", "$top": "999"}
+
+
+def _rest_pages(token: str, first: dict) -> list[dict]:
+    """
+    Items of a collection response plus every page after it. The skiptoken in
+    @odata.nextLink is opaque, so later pages can't be requested up front.
+    """
+    items = first.get("value", [])
+    next_link = first.get("@odata.nextLink")
+    while next_link:
+        r = _request("GET", next_link, headers=_headers(token), timeout=60)
+        r.raise_for_status()
+        page = _json(r)
+        items.extend(page.get("value", []))
+        next_link = page.get("@odata.nextLink")
+    return items
+
+
+def _children(token: str, drive_id: str, folder_item_id: str):
+    url = f"{GRAPH_BASE}/drives/{drive_id}/items/{folder_item_id}/children"
+    r = _request("GET", url, headers=_headers(token), params=_CHILD_PARAMS, timeout=60)
     r.raise_for_status()
-    return r.json()["id"]
+    return _rest_pages(token, _json(r))
 
 
-def _item_by_path(token: str, drive_id: str, path: str):
-    path = path.strip("/")
-    url = f"{GRAPH_BASE}/drives/{drive_id}/root:/{path}"
-    r = requests.get(url, headers=_headers(token), timeout=60)
+def _children_by_path(token: str, drive_id: str, path: str):
+    """Children of the folder at path; None if the path is missing."""
+    url = f"{GRAPH_BASE}/drives/{drive_id}/root:/{path.strip('/')}:/children"
+    r = _request("GET", url, headers=_headers(token), params=_CHILD_PARAMS, timeout=60)
     if r.status_code == 404:
         return None
     r.raise_for_status()
-    return r.json()
+    return _rest_pages(token, _json(r))
 
 
-def _children(token: str, drive_id: str, folder_item_id: str):
-    url = f"{GRAPH_BASE}/drives/{drive_id}/items/{folder_item_id}/children"
-    r = requests.get(url, headers=_headers(token), timeout=60)
+def _children_with_prefix(token: str, drive_id: str, path: str, prefix: str, params: dict | None = None):
+    """
+    Children of the folder at path whose name starts with prefix, filtered by
+    Graph; None if the path is missing. params override the default query
+    options (e.g. a narrower $select). Drives that reject the query (400) get
+    the plain listing, so callers must still check names themselves.
+    """
+    url = f"{GRAPH_BASE}/drives/{drive_id}/root:/{path.strip('/')}:/children"
+    quoted = prefix.replace("'", "''")
+    query = {**_CHILD_PARAMS, **(params or {}), "$filter": f"startswith(name,'{quoted}')"}
+    r = _request("GET", url, headers=_headers(token), params=query, timeout=60)
+    if r.status_code == 400:
+        return _children_by_path(token, drive_id, path)
+    if r.status_code == 404:
+        return None
     r.raise_for_status()
-    return r.json().get("value", [])
+    return _rest_pages(token, _json(r))
+
+
+def _child_by_name(token: str, drive_id: str, parent_item_id: str, name: str):
+    """The named child of a folder, addressed directly; None if it doesn't exist."""
+    url = f"{GRAPH_BASE}/drives/{drive_id}/items/{parent_item_id}:/{quote(name)}:"
+    r = _request("GET", url, headers=_headers(token), timeout=60)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return _json(r)
 
 
 def ensure_folder(token: str, drive_id: str, parent_item_id: str, folder_name: str) -> dict:
-    kids = _children(token, drive_id, parent_item_id)
-    for k in kids:
-        if k.get("name") == folder_name and k.get("folder") is not None:
-            return k
+    k = _child_by_name(token, drive_id, parent_item_id, folder_name)
+    if k is not None and k.get("folder") is not None:
+        return k
 
     url = f"{GRAPH_BASE}/drives/{drive_id}/items/{parent_item_id}/children"
     payload = {"name": folder_name, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
-    r = requests.post(url, headers=_headers(token, {"Content-Type": "application/json"}), json=payload, timeout=60)
+    r = _request("POST", url, headers=_headers(token, {"Content-Type": "application/json"}), data=orjson.dumps(payload), timeout=60)
 
     if r.status_code == 409:
-        kids = _children(token, drive_id, parent_item_id)
-        for k in kids:
-            if k.get("name") == folder_name and k.get("folder") is not None:
-                return k
+        k = _child_by_name(token, drive_id, parent_item_id, folder_name)
+        if k is not None and k.get("folder") is not None:
+            return k
 
     r.raise_for_status()
-    return r.json()
+    return _json(r)
 
 
-def ensure_path(token: str, drive_id: str, root_path: str, parts: list[str]) -> dict:
-    root_item = _item_by_path(token, drive_id, root_path)
-    if not root_item:
-        raise RuntimeError(f"Root path not found in drive: {root_path}")
+def _ensure_leaf(token: str, drive_id: str, parent_item_id: str, name: str, path: str, exist_ok: bool) -> dict:
+    """ensure_folder for the last level of ensure_path, honouring exist_ok."""
+    # the parent may gain a child either way; its name listing is stale now
+    _NAME_CACHE.pop(_item_key(token, drive_id, path.rsplit("/", 1)[0]))
+    if exist_ok:
+        return ensure_folder(token, drive_id, parent_item_id, name)
 
-    current = root_item
-    for name in parts:
-        current = ensure_folder(token, drive_id, current["id"], name)
+    if _child_by_name(token, drive_id, parent_item_id, name) is not None:
+        raise FileExistsError(f"Folder already exists: {path}")
+    url = f"{GRAPH_BASE}/drives/{drive_id}/items/{parent_item_id}/children"
+    payload = {"name": name, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
+    r = _request("POST", url, headers=_headers(token, {"Content-Type": "application/json"}), data=orjson.dumps(payload), timeout=60)
+    if r.status_code == 409:
+        raise FileExistsError(f"Folder already exists: {path}")
+    r.raise_for_status()
+    return _json(r)
+
+
+def ensure_path(token: str, drive_id: str, root_path: str, parts: list[str], exist_ok: bool = True) -> dict:
+    """
+    One $batch GET resolves the root and every level under it; missing levels
+    are then created in one more $batch, each POST depending on the previous.
+    With exist_ok=False an already existing leaf (found, or created by someone
+    else in the meantime) raises FileExistsError instead of being returned.
+    """
+    root = root_path.strip("/")
+    paths = [root] + [f"{root}/" + "/".join(parts[:i + 1]) for i in range(len(parts))]
+
+    # Only the levels above the leaf (root/year/city) are cached; the leaf is
+    # always checked with Graph. With its parent cached, only the leaf is left.
+    parent = _ITEM_CACHE.get(_item_key(token, drive_id, paths[-2])) if parts else None
+    if parent:
+        try:
+            return _ensure_leaf(token, drive_id, parent["id"], parts[-1], paths[-1], exist_ok)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+            # parent deleted or moved since it was cached: resolve from scratch
+            for p in paths[:-1]:
+                _ITEM_CACHE.pop(_item_key(token, drive_id, p))
+
+    found = graph_batch(token, [
+        {"id": str(i), "method": "GET", "url": f"/drives/{drive_id}/root:/{quote(p)}"}
+        for i, p in enumerate(paths)
+    ])
+
+    root_status = found["0"]["status"]
+    if root_status == 404:
+        raise RuntimeError(f"Root path not found in drive: {root_path}")
+    if root_status != 200:
+        raise RuntimeError(f"Graph returned {root_status} for root path: {root_path}")
+
+    # deepest existing level; once one level is missing, all below it are too
+    depth = 0
+    while depth + 1 < len(paths) and found[str(depth + 1)]["status"] == 200:
+        depth += 1
+    for i in range(min(depth + 1, len(parts))):
+        _ITEM_CACHE.set(_item_key(token, drive_id, paths[i]), found[str(i)]["body"])
+    current = found[str(depth)]["body"]
+    if depth == len(parts):
+        if not exist_ok:
+            raise FileExistsError(f"Folder already exists: {paths[-1]}")
+        return current
+
+    creates = []
+    for i in range(depth, len(parts)):
+        req = {
+            "id": f"c{i}",
+            "method": "POST",
+            "url": f"/drives/{drive_id}/root:/{quote(paths[i])}:/children",
+            "headers": {"Content-Type": "application/json"},
+            "body": {"name": parts[i], "folder": {}, "@microsoft.graph.conflictBehavior": "fail"},
+        }
+        if creates:
+            req["dependsOn"] = [creates[-1]["id"]]
+        creates.append(req)
+    made = graph_batch(token, creates)
+    # parents that gained a child must be re-listed by the next duplicate check
+    for p in paths[depth:-1]:
+        _NAME_CACHE.pop(_item_key(token, drive_id, p))
+
+    for i in range(depth, len(parts)):
+        resp = made.get(f"c{i}", {})
+        if resp.get("status") not in (200, 201):
+            # lost a race (409) or an earlier create failed: finish one by one
+            for name in parts[i:-1]:
+                current = ensure_folder(token, drive_id, current["id"], name)
+            return _ensure_leaf(token, drive_id, current["id"], parts[-1], paths[-1], exist_ok)
+        current = resp["body"]
+        if i + 1 < len(parts):
+            _ITEM_CACHE.set(_item_key(token, drive_id, paths[i + 1]), current)
     return current
 
 
-def upload_file_to_folder(token: str, drive_id: str, folder_item_id: str, filename: str, content_bytes: bytes, content_type: str):
+# Upload Content-Type by file extension when the caller doesn't give one
+CONTENT_TYPES = {
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".txt": "text/plain; charset=utf-8",
+}
+
+SIMPLE_UPLOAD_MAX = 4 * 1024 * 1024
+UPLOAD_CHUNK = 16 * 320 * 1024  # 5 MiB; Graph wants multiples of 320 KiB
+
+
+def _upload_session(token: str, drive_id: str, folder_item_id: str, filename: str, content: BinaryIO, total: int):
+    url = f"{GRAPH_BASE}/drives/{drive_id}/items/{folder_item_id}:/{filename}:/createUploadSession"
+    payload = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+    r = _request("POST", url, headers=_headers(token, {"Content-Type": "application/json"}), data=orjson.dumps(payload), timeout=60)
+    r.raise_for_status()
+    upload_url = _json(r)["uploadUrl"]
+
+    # Graph rejects out-of-order fragments, so chunks go up one after another.
+    # The upload URL is pre-authorized and must not carry the bearer token.
+    # Only one chunk is held in memory at a time.
+    for start in range(0, total, UPLOAD_CHUNK):
+        chunk = content.read(UPLOAD_CHUNK)
+        end = start + len(chunk) - 1
+        r = _request(
+            "PUT",
+            upload_url,
+            headers={"Content-Range": f"bytes {start}-{end}/{total}"},
+            data=chunk,
+            timeout=120,
+        )
+        r.raise_for_status()
+    return _json(r)
+
+
+def upload_file_to_folder(token: str, drive_id: str, folder_item_id: str, filename: str, content: bytes | BinaryIO, content_type: str | None = None):
+    """
+    content is bytes or a binary file object (e.g. an open file or a Streamlit
+    UploadedFile), read from its current position; large files are streamed.
+    content_type defaults to one looked up from the filename's extension.
+    """
+    if content_type is None:
+        content_type = CONTENT_TYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        content = io.BytesIO(content)
+    start = content.tell()
+    total = content.seek(0, io.SEEK_END) - start
+    content.seek(start)
+
+    # Simple PUT is capped at 4 MB; bigger files need an upload session
+    if total > SIMPLE_UPLOAD_MAX:
+        return _upload_session(token, drive_id, folder_item_id, filename, content, total)
+
+    # read once so a throttled PUT can be retried with the same body
     url = f"{GRAPH_BASE}/drives/{drive_id}/items/{folder_item_id}:/{filename}:/content"
-    r = requests.put(url, headers=_headers(token, {"Content-Type": content_type}), data=content_bytes, timeout=120)
+    r = _request("PUT", url, headers=_headers(token, {"Content-Type": content_type}), data=content.read(), timeout=120)
     r.raise_for_status()
-    return r.json()
+    return _json(r)
+
+
+def _folder_names(token: str, drive_id: str, path: str) -> frozenset:
+    """Names of the subfolders at path, listed at most once per TTL."""
+    key = _item_key(token, drive_id, path)
+    names = _NAME_CACHE.get(key)
+    if names is None:
+        kids = _children_by_path(token, drive_id, path) or []
+        names = frozenset(k["name"] for k in kids if k.get("folder") is not None)
+        _NAME_CACHE.set(key, names)
+    return names
+
+
+def prewarm_city_folders(token: str, drive_id: str, root_path: str, years: list[str], cities: list[str]) -> None:
+    """
+    List every <root>/<Year>/<City> folder in one $batch and seed the name
+    cache, so the first duplicate check for any of them is answered locally.
+    Best effort: failures just leave the cache cold.
+    """
+    root = root_path.strip("/")
+    paths = [f"{root}/{y}/{c}" for y in years for c in cities]
+    select = "&".join(f"{k}={v}" for k, v in _CHILD_PARAMS.items())
+    try:
+        found = graph_batch(token, [
+            {"id": str(i), "method": "GET", "url": f"/drives/{drive_id}/root:/{quote(p)}:/children?{select}"}
+            for i, p in enumerate(paths)
+        ])
+    except (requests.RequestException, ValueError):
+        return
+
+    for i, p in enumerate(paths):
+        resp = found.get(str(i), {})
+        body = resp.get("body") or {}
+        # a paged listing is incomplete; leave it to the next real check
+        if resp.get("status") != 200 or "@odata.nextLink" in body:
+            continue
+        names = frozenset(k["name"] for k in body.get("value", []) if k.get("folder") is not None)
+        _NAME_CACHE.set(_item_key(token, drive_id, p), names)
+
+
+def ir_folder_seen(token: str, drive_id: str, root_path: str, year: str, city: str, incident_folder_name: str) -> bool:
+    """
+    UI hint only: answered from a name listing up to a minute old. Anything
+    that writes must use check_duplicate_ir instead.
+    """
+    return incident_folder_name in _folder_names(token, drive_id, f"{root_path}/{year}/{city}")
 
 
 def check_duplicate_ir(token: str, drive_id: str, root_path: str, year: str, city: str, incident_folder_name: str) -> bool:
-    path = f"{root_path}/{year}/{city}/{incident_folder_name}"
-    item = _item_by_path(token, drive_id, path)
-    return bool(item and item.get("folder") is not None)
+    # Live lookup of the exact path, bypassing every cache and singleflight:
+    # this guards uploads, so it never shares another caller's in-flight answer
+    path = f"{root_path}/{year}/{city}/{incident_folder_name}".strip("/")
+    r = _send("GET", f"{GRAPH_BASE}/drives/{drive_id}/root:/{path}", headers=_headers(token), timeout=60)
+    if r.status_code == 404:
+        return False
+    r.raise_for_status()
+    return _json(r).get("folder") is not None
 
 
 # ---------------------------
@@ -99,11 +526,10 @@ def list_incident_folders(token: str, drive_id: str, base_path: str) -> list[dic
     base_path is .../<Year>/<City>
     returns [{"id":..., "name":...}, ...] for folders only
     """
-    folder = _item_by_path(token, drive_id, base_path)
-    if not folder or folder.get("folder") is None:
+    kids = _children_by_path(token, drive_id, base_path)
+    if kids is None:
         raise RuntimeError(f"Folder not found: {base_path}")
 
-    kids = _children(token, drive_id, folder["id"])
     out = []
     for k in kids:
         if k.get("folder") is not None:
@@ -112,6 +538,38 @@ def list_incident_folders(token: str, drive_id: str, base_path: str) -> list[dic
     return sorted(out, key=lambda x: x["name"].lower())
 
 
+# ---------------------------
+# incident serials
+# ---------------------------
+def _ir_prefix(year: str, site_code: str) -> str:
+    return f"SMCOD-IR-GS-{site_code}-{year}-"
+
+
+def _ir_serials(kids: list[dict], year: str, site_code: str):
+    """Yield serials from folder names like SMCOD-IR-GS-DVO-2025-0007."""
+    # fixed prefix + 4 ASCII digits; plain string checks, no regex per name
+    prefix = _ir_prefix(year, site_code)
+    size = len(prefix) + 4
+    for k in kids:
+        if k.get("folder") is None:
+            continue
+        name = k.get("name", "")
+        tail = name[-4:]
+        if len(name) == size and name.startswith(prefix) and tail.isascii() and tail.isdigit():
+            yield int(tail)
+
+
+def last_ir_serial(token: str, drive_id: str, root_path: str, year: str, city: str, site_code: str) -> int:
+    """
+    Highest serial used under <root>/<Year>/<City> (0 if none or missing).
+    Taken as the max over the prefix-filtered listing: Graph may silently
+    ignore $orderby on children, so a single "top" item can't be trusted.
+    """
+    path = f"{root_path}/{year}/{city}"
+    kids = _children_with_prefix(token, drive_id, path, _ir_prefix(year, site_code), {"$select": "id,name,folder"}) or []
+    return max(_ir_serials(kids, year, site_code), default=0)
+
+
 # ---------------------------
 # NEW: list files inside incident folder
 # ---------------------------
@@ -131,7 +589,7 @@ def list_files(token: str, drive_id: str, folder_item_id: str) -> list[dict]:
 
 def download_file_bytes(token: str, drive_id: str, file_item_id: str) -> bytes:
     url = f"{GRAPH_BASE}/drives/{drive_id}/items/{file_item_id}/content"
-    r = requests.get(url, headers=_headers(token), timeout=120)
+    r = _request("GET", url, headers=_headers(token), timeout=120)
     r.raise_for_status()
     return r.content
 
@@ -143,20 +601,12 @@ def download_file_text(token: str, drive_id: str, file_item_id: str) -> str:
 
 def update_file_text(token: str, drive_id: str, file_item_id: str, new_text: str):
     meta_url = f"{GRAPH_BASE}/drives/{drive_id}/items/{file_item_id}"
-    meta = requests.get(meta_url, headers=_headers(token), timeout=60)
+    meta = _request("GET", meta_url, headers=_headers(token), timeout=60)
     meta.raise_for_status()
-    meta = meta.json()
+    meta = _json(meta)
 
     parent_id = meta["parentReference"]["id"]
     filename = meta["name"]
 
     content_bytes = (new_text or "").encode("utf-8")
-    url = f"{GRAPH_BASE}/drives/{drive_id}/items/{parent_id}:/{filename}:/content"
-    r = requests.put(
-        url,
-        headers=_headers(token, {"Content-Type": "text/plain; charset=utf-8"}),
-        data=content_bytes,
-        timeout=120,
-    )
-    r.raise_for_status()
-    return r.json()
+    return upload_file_to_folder(token, drive_id, parent_id, filename, content_bytes, "text/plain; charset=utf-8")